@@ -1,5 +1,6 @@
 import os
 import sqlite3
+from contextlib import closing
 import uuid
 import pandas as pd
 import datetime as dt
@@ -235,15 +236,31 @@ def save_to_db(
     table_name: str
 ) -> None:
     """
-        Speichert die Daten in einer SQLite-Datenbank.
+        Speichert die Daten in einer SQLite-Datenbank. Die Tabelle wird mit expliziten Spaltentypen neu angelegt
+        und alle Zeilen werden in einer einzigen Transaktion per executemany geschrieben.
 
     :param df: DataFrame, der in der Datenbank gespeichert werden soll
     :param db_name: Name der SQLite-Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
     """
 
-    with sqlite3.connect(db_name) as connection:
-        df.to_sql(table_name, connection, if_exists='replace', index=False)
-        connection.commit()
+    columns = []
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            sql_type = "INTEGER"
+        elif pd.api.types.is_numeric_dtype(dtype):
+            sql_type = "REAL"
+        else:
+            sql_type = "TEXT"
+        columns.append(f'"{column}" {sql_type}')
+
+    with closing(sqlite3.connect(db_name)) as connection, connection:
+        connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        connection.execute(f'CREATE TABLE "{table_name}" ({", ".join(columns)})')
+        # tolist liefert Python-Typen (int, float, str), NaN speichert SQLite als NULL
+        connection.executemany(
+            f'INSERT INTO "{table_name}" VALUES ({", ".join("?" for _ in columns)})',
+            zip(*[df[column].tolist() for column in df.columns]))
 
 
 def show_db(
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+from urllib.parse import quote
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+def sqlite_url(
+        db_path: str,
+        immutable: bool = False
+) -> str:
+    """
+        Erstellt die URL für eine nur lesende SQLite-Verbindung über aiosqlite.
+        Mit immutable geht SQLite davon aus, dass sich die Datei nie ändert, und verzichtet auf jegliches Locking.
+        Das ist nur für fertig geschriebene Dateien des ETL zulässig, die danach nicht mehr verändert werden.
+
+    :param db_path: Pfad zur Datenbank
+    :param immutable: Datei als unveränderlich öffnen
+    :return: Die Datenbank-URL
+    """
+
+    url = f"sqlite+aiosqlite:///file:{quote(db_path)}?mode=ro&uri=true"
+    if immutable:
+        url += "&immutable=1"
+
+    return url
+
+
+def create_engine(
+        db_path: str,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        echo: bool = False,
+        immutable: bool = False,
+        mmap_size: int = 0,
+        cache_size: int = -2000
+) -> AsyncEngine:
+    """
+        Erstellt die asynchrone Engine für das Backend. Die Datenbank wird nur lesend geöffnet und jede neue
+        Verbindung erhält die Pragmas mmap_size, cache_size und query_only, sodass der Serverprozess nie
+        Schreibsperren anfordert und Lesezugriffe über den Seiten-Cache laufen.
+
+    :param db_path: Pfad zur Datenbank
+    :param pool_size: Anzahl der dauerhaft offenen Verbindungen
+    :param max_overflow: Anzahl zusätzlicher Verbindungen bei Lastspitzen
+    :param echo: Alle SQL-Anweisungen loggen
+    :param immutable: Datei als unveränderlich öffnen (siehe sqlite_url)
+    :param mmap_size: Größe des Memory-Mappings in Bytes (0 deaktiviert es)
+    :param cache_size: Größe des Seiten-Caches (negativ in KiB, positiv in Seiten)
+    :return: Die Engine
+    """
+
+    engine = create_async_engine(
+        sqlite_url(db_path, immutable),
+        echo=echo,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size = {int(cache_size)}")
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+    return engine
+
+
+class EngineSwitch:
+    """
+        Hält die Engine für die aktive Datenbankdatei. Veröffentlicht das ETL eine neue Version, wird für die neue
+        Datei eine neue Engine erstellt und ab sofort für alle neuen Sessions verwendet. Laufende Anfragen behalten
+        ihre Verbindung zur alten Datei; deren Pool wird aufgelöst, sodass die Verbindungen bei der Rückgabe
+        geschlossen werden.
+
+    :param factory: Funktion, die die Engine für einen Dateipfad erstellt
+    """
+
+    def __init__(
+            self,
+            factory: Callable[[str], AsyncEngine]
+    ):
+        self.factory = factory
+        self.path: Optional[str] = None
+        self.engine: Optional[AsyncEngine] = None
+        self._sessions: Optional[sessionmaker] = None
+        self._lock = asyncio.Lock()
+
+    async def sessions(
+            self,
+            path: str
+    ) -> sessionmaker:
+        """
+            Gibt die Session-Factory für die angegebene Datenbankdatei zurück und wechselt die Engine,
+            falls sich die Datei geändert hat.
+
+        :param path: Pfad der aktiven Datenbankdatei
+        :return: Die Session-Factory
+        """
+
+        if path == self.path:
+            return self._sessions
+
+        async with self._lock:
+            if path != self.path:
+                previous = self.engine
+                self.engine = self.factory(path)
+                self._sessions = sessionmaker(
+                    autocommit=False, autoflush=False, bind=self.engine, class_=AsyncSession)
+                self.path = path
+
+                if previous is not None:
+                    logger.info("Switched database to %s", path)
+                    await previous.dispose()
+
+        return self._sessions
+
+    async def dispose(self) -> None:
+        """
+            Schließt alle Verbindungen der aktuellen Engine (beim Herunterfahren des Servers).
+        """
+
+        if self.engine is not None:
+            await self.engine.dispose()
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import List, NamedTuple, Optional
+
+# Tabelle, in die das ETL bei jedem Lauf eine Run-ID schreibt
+RUN_TABLE = "ETL_Run"
+
+
+class DatasetVersion(NamedTuple):
+    """
+        Version des Datenbestands, bestehend aus der Run-ID des ETL, dem Änderungszeitpunkt und dem Pfad
+        der aktiven Datenbankdatei.
+
+    :param run_id: Run-ID des letzten ETL-Laufs (None, wenn die Datenbank keine enthält)
+    :param mtime_ns: Änderungszeitpunkt der Datenbankdatei in Nanosekunden
+    :param path: Pfad der Datenbankdatei, aus der gelesen wird
+    """
+
+    run_id: Optional[str]
+    mtime_ns: int
+    path: str
+
+    @property
+    def token(self) -> str:
+        """
+            Kurze, eindeutige Darstellung der Version.
+
+        :return: Die Run-ID, oder der Änderungszeitpunkt falls keine Run-ID vorhanden ist
+        """
+
+        return self.run_id or f"mtime-{self.mtime_ns}"
+
+
+def marker_path(
+        db_path: str
+) -> str:
+    """
+        Pfad der Markierungsdatei, in die das ETL den Dateinamen der veröffentlichten Datenbankversion schreibt
+        (z.B. CostOfLivingAndIncome.current neben CostOfLivingAndIncome.db).
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :return: Pfad der Markierungsdatei
+    """
+
+    return os.path.splitext(db_path)[0] + ".current"
+
+
+def resolve_database(
+        db_path: str
+) -> str:
+    """
+        Ermittelt die aktive Datenbankdatei. Gibt es eine Markierungsdatei des ETL, ist das die darin genannte
+        veröffentlichte Version, sonst die konfigurierte Datei selbst.
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :return: Pfad der aktiven Datenbankdatei
+    """
+
+    try:
+        with open(marker_path(db_path), "r", encoding="utf-8") as file:
+            name = file.read().strip()
+    except OSError:
+        return db_path
+
+    path = os.path.join(os.path.dirname(db_path), name)
+
+    return path if name and os.path.exists(path) else db_path
+
+
+def connect_read_only(
+        db_path: str
+) -> sqlite3.Connection:
+    """
+        Öffnet eine nur lesende Verbindung zur SQLite-Datenbank.
+
+    :param db_path: Pfad zur Datenbank
+    :return: Die Verbindung
+    """
+
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def read_run_id(
+        db_path: str
+) -> Optional[str]:
+    """
+        Liest die Run-ID des letzten ETL-Laufs aus der Datenbank.
+
+    :param db_path: Pfad zur Datenbank
+    :return: Die Run-ID oder None, wenn keine vorhanden ist
+    """
+
+    try:
+        with closing(connect_read_only(db_path)) as connection:
+            row = connection.execute(
+                f'SELECT Run_ID FROM "{RUN_TABLE}" ORDER BY rowid DESC LIMIT 1'
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+
+    return row[0] if row else None
+
+
+def check_schema(
+        db_path: str,
+        table_name: str,
+        primary_key: List[str],
+        indexes: List[List[str]]
+) -> List[str]:
+    """
+        Prüft, ob die Tabelle den erwarteten Primärschlüssel und die erwarteten Indizes besitzt.
+        Ein Index gilt als vorhanden, wenn ein Index mit denselben Spalten in derselben Reihenfolge existiert.
+
+    :param db_path: Pfad zur Datenbank
+    :param table_name: Name der Tabelle
+    :param primary_key: Spalten des erwarteten Primärschlüssels
+    :param indexes: Spalten der erwarteten Indizes
+    :return: Liste der gefundenen Probleme (leer, wenn alles vorhanden ist)
+    """
+
+    try:
+        with closing(connect_read_only(db_path)) as connection:
+            table_info = connection.execute(
+                f'PRAGMA table_info("{table_name}")').fetchall()
+            index_columns = [
+                [info[2] for info in connection.execute(f'PRAGMA index_info("{index[1]}")')]
+                for index in connection.execute(f'PRAGMA index_list("{table_name}")')
+            ]
+    except sqlite3.Error as error:
+        return [f"cannot read schema of {table_name} ({error})"]
+
+    if not table_info:
+        return [f"table {table_name} is missing"]
+
+    problems = []
+
+    # Spalte 5 von table_info ist die Position im Primärschlüssel (0 = nicht Teil des Schlüssels)
+    actual_key = [info[1] for info in sorted(table_info, key=lambda info: info[5]) if info[5]]
+    if actual_key != primary_key:
+        problems.append(
+            f"{table_name} has primary key {actual_key or None}, expected {primary_key}")
+
+    for columns in indexes:
+        if columns not in index_columns:
+            problems.append(f"{table_name} has no index on ({', '.join(columns)})")
+
+    return problems
+
+
+class DatasetWatcher:
+    """
+        Beobachtet die Datenbankdatei und liefert die aktuelle Datenversion.
+        Die Datei wird höchstens alle check_interval Sekunden geprüft, die Run-ID nur bei geänderter mtime gelesen.
+        Veröffentlicht das ETL eine neue Version (Markierungsdatei), wechselt die Version auf die neue Datei.
+
+    :param db_path: Pfad zur Datenbank
+    :param check_interval: Mindestabstand zwischen zwei Prüfungen in Sekunden
+    """
+
+    def __init__(
+            self,
+            db_path: str,
+            check_interval: float = 1.0
+    ):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._version: Optional[DatasetVersion] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> DatasetVersion:
+        """
+            Gibt die aktuelle Datenversion zurück.
+
+        :return: Die aktuelle Version
+        """
+
+        now = time.monotonic()
+        version = self._version
+        if version is not None and now - self._checked_at < self.check_interval:
+            return version
+
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self.check_interval:
+                return self._version
+
+            path = resolve_database(self.db_path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime_ns = 0
+
+            if self._version is None or self._version[1:] != (mtime_ns, path):
+                self._version = DatasetVersion(read_run_id(path), mtime_ns, path)
+            self._checked_at = now
+
+            return self._version
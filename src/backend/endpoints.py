@@ -1,28 +1,60 @@
-import math
-import os
-from typing import List
-
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import Column, Integer, String, Float, func
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Column, Index, Integer, String, Float, func
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import select, distinct
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .database import EngineSwitch, create_engine
+from .dataset import DatasetVersion, DatasetWatcher, check_schema
+from .http_cache import conditional_route
+from .response_cache import ResponseCache
+from .serialization import Orient, Table, encode_response, negotiate_media_type
+from .scoring import (
+    RECOMMENDATION_COLUMNS, RecommendationBase, RecommendationView, recommendation_chart, score_recommendations
+)
+from .settings import (
+    CACHE_MAX_AGE, DATABASE_PATH, DB_ECHO, DB_IMMUTABLE, DB_MAX_OVERFLOW, DB_POOL_SIZE, RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_MAX_ENTRIES, SERVING_MODE, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, VERSION_CHECK_INTERVAL
+)
+from .snapshot import ColumnarSnapshot, SnapshotStore
 
 # Davide Pedergnana 
 
-# Absoluter Pfad zur Datenbank
-DATABASE_PATH = os.path.join(
-    os.getcwd(), 'src', 'database', 'CostOfLivingAndIncome.db'
-)
+logger = logging.getLogger(__name__)
+
+
+
+def _create_engine(
+    db_path: str
+) -> AsyncEngine:
+    """
+        Erstellt die Datenbankverbindung (nur lesend) für die aktive Datenbankdatei.
+        Vom ETL veröffentlichte Versionen werden nie mehr verändert und daher als unveränderlich geöffnet.
+
+    :param db_path: Pfad der aktiven Datenbankdatei
+    :return: Die Engine
+    """
 
-# Datenbank URL
-DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+    return create_engine(
+        db_path,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        echo=DB_ECHO,
+        immutable=DB_IMMUTABLE or db_path != DATABASE_PATH,
+        mmap_size=SQLITE_MMAP_SIZE,
+        cache_size=SQLITE_CACHE_SIZE,
+    )
 
-# Erstellen der Datenbankverbindung
-engine = create_async_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+
+# Erstellen der Datenbankverbindung, wechselt bei einer neu veröffentlichten Version auf die neue Datei
+engines = EngineSwitch(_create_engine)
 Base = declarative_base()
 
 # Datenmodell für die Tabelle CostOfLivingAndIncome
@@ -33,9 +65,13 @@ class CostOfLivingAndIncome(Base):
     """
 
     __tablename__ = "CostOfLivingAndIncome"
+    __table_args__ = (
+        Index("ix_CostOfLivingAndIncome_Year_Region_Country", "Year", "Region", "Country"),
+        Index("ix_CostOfLivingAndIncome_Region_Year", "Region", "Year"),
+    )
 
-    Country = Column(String, primary_key=True, index=True)
-    Year = Column(Integer)
+    Country = Column(String, primary_key=True)
+    Year = Column(Integer, primary_key=True)
     Average_Monthly_Income = Column(Float)
     Net_Income = Column(Float)
     Cost_of_Living = Column(Float)
@@ -56,45 +92,247 @@ class CostOfLivingAndIncome(Base):
     Region = Column(String)
 
 
-router = APIRouter()
+# Vom ETL vorberechnete Tabelle RegionYearAggregate
+class RegionYearAggregate(Base):
+    """
+        Definition der Tabelle RegionYearAggregate (Mittelwerte je Region und Jahr).
+        Run_ID ist der Versionsstempel des ETL-Laufs, der die Tabelle geschrieben hat.
+
+    """
+
+    __tablename__ = "RegionYearAggregate"
+
+    Region = Column(String, primary_key=True)
+    Year = Column(Integer, primary_key=True)
+    Average_Monthly_Income = Column(Float)
+    Net_Income = Column(Float)
+    Cost_of_Living = Column(Float)
+    Housing_Cost_Percentage = Column(Float)
+    Housing_Cost = Column(Float)
+    Savings = Column(Float)
+    Healthcare_Cost = Column(Float)
+    Education_Cost = Column(Float)
+    Transportation_Cost = Column(Float)
+    Sum_Costs = Column(Float)
+    Tax_Rate = Column(Float)
+    Run_ID = Column(String)
+
+
+# Spalten, die von den einzelnen Endpunkten ausgegeben werden
+REGION_AVERAGE_COLUMNS = [
+    "Average_Monthly_Income", "Net_Income", "Cost_of_Living", "Housing_Cost_Percentage", "Housing_Cost",
+    "Savings", "Healthcare_Cost", "Education_Cost", "Transportation_Cost", "Sum_Costs", "Tax_Rate"
+]
+COUNTRY_COLUMNS = [
+    "Country", "Year", "Average_Monthly_Income", "Net_Income", "Housing_Cost", "Healthcare_Cost",
+    "Education_Cost", "Transportation_Cost", "Region", "Savings"
+]
+
+# Beobachtet die Datenbankdatei auf neue ETL-Läufe
+dataset_watcher = DatasetWatcher(DATABASE_PATH, VERSION_CHECK_INTERVAL)
+
+# Im Snapshot-Betrieb wird die Tabelle einmal in den Arbeitsspeicher geladen und alle Endpunkte antworten daraus
+snapshot_store = SnapshotStore(
+    CostOfLivingAndIncome.__tablename__, dataset_watcher
+) if SERVING_MODE == "snapshot" else None
+
+
+def startup() -> None:
+    """
+        Wird beim Start des Servers aufgerufen. Prüft, ob die Datenbank den Primärschlüssel und die Indizes
+        des Datenmodells besitzt, und lädt im Snapshot-Betrieb die Tabelle.
+    """
+
+    db_path = dataset_watcher.current().path
+    table = CostOfLivingAndIncome.__table__
+    for problem in check_schema(
+        db_path,
+        table.name,
+        [column.name for column in table.primary_key.columns],
+        [[column.name for column in index.columns] for index in table.indexes]
+    ):
+        logger.warning("Database %s: %s", db_path, problem)
+
+    if snapshot_store is not None:
+        snapshot_store.load()
+
+
+def current_version() -> DatasetVersion:
+    """
+        Liefert die Datenversion, aus der aktuell geantwortet wird.
+        Im Snapshot-Betrieb ist das die Version des geladenen Snapshots, nicht die der Datei.
+
+    :return: Die Datenversion
+    """
+
+    if snapshot_store is not None:
+        return snapshot_store.get().version
+
+    return dataset_watcher.current()
+
+
+# GET-Endpunkte erhalten ETag/Last-Modified und beantworten bedingte Anfragen mit 304
+# Die Datenendpunkte liefern je nach Accept-Header JSON oder Arrow, daher geht Accept in den ETag ein
+router = APIRouter(route_class=conditional_route(current_version, CACHE_MAX_AGE, vary=["Accept"]))
+
+# Serialisierte Antworten der Empfehlungs- und Länderabfragen
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+
+def _table_response(
+    table: Table,
+    media_type: str,
+    orient: Orient
+) -> Response:
+    """
+        Serialisiert eine Tabelle direkt zu einer Antwort, ohne Validierung durch ein response_model.
+
+    :param table: Die Tabelle
+    :param media_type: Das ausgehandelte Format (JSON oder Arrow)
+    :param orient: "records" oder "columns" (nur JSON)
+    :return: Die Antwort
+    """
+
+    return Response(content=encode_response(table, media_type, orient), media_type=media_type)
+
+
+def _served_version(
+    session: Optional[AsyncSession],
+    snapshot: Optional[ColumnarSnapshot]
+) -> DatasetVersion:
+    """
+        Liefert die Datenversion, aus der eine Anfrage beantwortet wird: die des Snapshots bzw. die Version,
+        für die die Session geöffnet wurde (nicht die aktuelle Version, die sich inzwischen geändert haben kann).
+
+    :param session: Die Session (None im Snapshot-Betrieb)
+    :param snapshot: Der Snapshot (None im Datenbank-Betrieb)
+    :return: Die Datenversion
+    """
+
+    return snapshot.version if snapshot is not None else session.info["version"]
+
+
+async def _cached_response(
+    key: tuple,
+    version: DatasetVersion,
+    media_type: str,
+    orient: Orient,
+    compute: Callable[[], Awaitable[Table]]
+) -> Response:
+    """
+        Gibt die Antwort aus dem Antwort-Cache zurück oder berechnet, serialisiert und speichert sie.
+        Treffer überspringen sowohl die Abfrage als auch die Serialisierung.
+
+    :param key: Schlüssel der Anfrage (Endpunkt und Parameter)
+    :param version: Die Datenversion, aus der geantwortet wird
+    :param media_type: Das ausgehandelte Format (JSON oder Arrow)
+    :param orient: "records" oder "columns" (nur JSON)
+    :param compute: Funktion, die die Tabelle der Antwort berechnet
+    :return: Die Antwort
+    """
+
+    key = key + (media_type, orient)
+
+    body = response_cache.get(version, key)
+    if body is None:
+        body = encode_response(await compute(), media_type, orient)
+        response_cache.put(version, key, body)
+
+    return Response(content=body, media_type=media_type)
+
+
+async def get_media_type(
+    accept: Optional[str] = Header(None)
+) -> str:
+    """
+        Dependency, die das Antwortformat anhand des Accept-Headers aushandelt (JSON oder Arrow IPC Stream)
+
+    :param accept: Der Accept-Header
+    :return: Der Media Type der Antwort
+    """
+
+    return negotiate_media_type(accept)
 
 # Davide Pedergnana
 async def get_db():
     """
-        Dependency um die Datenbankverbindung zu erhalten
+        Dependency um die Datenbankverbindung zu erhalten.
+        Die Session gehört zur aktiven Datenbankdatei, deren Version in session.info["version"] steht.
+        Im Snapshot-Betrieb wird keine Session geöffnet.
 
-    :yield: die Datenbankverbindung
+    :yield: die Datenbankverbindung (None im Snapshot-Betrieb)
     """
 
-    async with SessionLocal() as session:
+    if snapshot_store is not None:
+        yield None
+        return
+
+    version = dataset_watcher.current()
+    sessions = await engines.sessions(version.path)
+    async with sessions() as session:
+        session.info["version"] = version
         yield session
 
+
+async def get_snapshot() -> Optional[ColumnarSnapshot]:
+    """
+        Dependency um den aktuellen Snapshot zu erhalten
+
+    :return: der Snapshot oder None, wenn der Snapshot-Betrieb nicht aktiv ist
+    """
+
+    if snapshot_store is None:
+        return None
+
+    return snapshot_store.get()
+
 # Davide Pedergnana 
 @router.get("/region-information")
-async def get_region_data(session: AsyncSession = Depends(get_db)) -> List[dict]:
+async def get_region_data(
+    orient: Orient = "records",
+    media_type: str = Depends(get_media_type),
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
+) -> Response:
     """
         Endpoint um alle Daten gruppiert nach Regionen abzufragen
 
+    :param orient: Form der JSON-Antwort, "records" (Liste von Objekten) oder "columns" (eine Liste pro Spalte).
+        Mit "Accept: application/vnd.apache.arrow.stream" wird stattdessen ein Arrow IPC Stream geliefert.
     :returns: Das Ergebnis der Abfrage
     """
+
+    if snapshot is not None:
+        return _table_response(
+            snapshot.group_means(["Region", "Year"], REGION_AVERAGE_COLUMNS), media_type, orient)
+
+    # Vorberechnete Tabelle lesen, solange sie zum aktuellen ETL-Lauf passt
+    run_id = session.info["version"].run_id
+    if run_id:
+        query = select(
+            RegionYearAggregate.Region,
+            RegionYearAggregate.Year,
+            *[getattr(RegionYearAggregate, column) for column in REGION_AVERAGE_COLUMNS]
+        ).where(RegionYearAggregate.Run_ID == run_id).order_by(
+            RegionYearAggregate.Region, RegionYearAggregate.Year)
+
+        try:
+            result = await session.execute(query)
+            data = result.fetchall()
+        except OperationalError:
+            # Tabelle fehlt (Datenbank von einem älteren ETL)
+            await session.rollback()
+            data = None
+
+        if data:
+            return _table_response(Table.from_rows(list(result.keys()), data), media_type, orient)
+
+    # Fallback: Live-Abfrage, wenn die vorberechnete Tabelle fehlt oder veraltet ist
     query = select(
         CostOfLivingAndIncome.Region,
         CostOfLivingAndIncome.Year,
-        func.avg(CostOfLivingAndIncome.Average_Monthly_Income).label(
-            "Average_Monthly_Income"),
-        func.avg(CostOfLivingAndIncome.Net_Income).label("Net_Income"),
-        func.avg(CostOfLivingAndIncome.Cost_of_Living).label("Cost_of_Living"),
-        func.avg(CostOfLivingAndIncome.Housing_Cost_Percentage).label(
-            "Housing_Cost_Percentage"),
-        func.avg(CostOfLivingAndIncome.Housing_Cost).label("Housing_Cost"),
-        func.avg(CostOfLivingAndIncome.Savings).label("Savings"),
-        func.avg(CostOfLivingAndIncome.Healthcare_Cost).label(
-            "Healthcare_Cost"),
-        func.avg(CostOfLivingAndIncome.Education_Cost).label("Education_Cost"),
-        func.avg(CostOfLivingAndIncome.Transportation_Cost).label(
-            "Transportation_Cost"),
-        func.avg(CostOfLivingAndIncome.Sum_Costs).label("Sum_Costs"),
-        func.avg(CostOfLivingAndIncome.Tax_Rate).label("Tax_Rate")
+        *[func.avg(getattr(CostOfLivingAndIncome, column)).label(column)
+          for column in REGION_AVERAGE_COLUMNS]
     ).group_by(CostOfLivingAndIncome.Region, CostOfLivingAndIncome.Year)
 
     result = await session.execute(query)
@@ -103,40 +341,67 @@ async def get_region_data(session: AsyncSession = Depends(get_db)) -> List[dict]
     if not data:
         raise HTTPException(status_code=404, detail="No data found.")
 
-    return [
-        {key: value for key, value in row._mapping.items()}
-        for row in data
-    ]
+    return _table_response(Table.from_rows(list(result.keys()), data), media_type, orient)
 
 
-@router.get("/country-information", response_model=List[dict])
+@router.get("/country-information")
 async def get_country_data(
     country: str,
     start_year: int = None,
-    session: AsyncSession = Depends(get_db)
-):
+    orient: Orient = "records",
+    media_type: str = Depends(get_media_type),
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
+) -> Response:
     """
         Endpoint um alle relevanten Daten für ein bestimmtes Land abzufragen
 
     :param country: Das Land für das die Daten abgefragt werden sollen
+    :param orient: Form der JSON-Antwort, "records" (Liste von Objekten) oder "columns" (eine Liste pro Spalte).
+        Mit "Accept: application/vnd.apache.arrow.stream" wird stattdessen ein Arrow IPC Stream geliefert.
     :returns: Das ergebnis der Abfrage
     """
 
+    return await _cached_response(
+        ("country-information", country, start_year),
+        _served_version(session, snapshot),
+        media_type,
+        orient,
+        lambda: _country_data(country, start_year, session, snapshot)
+    )
+
+
+async def _country_data(
+    country: str,
+    start_year: Optional[int],
+    session: Optional[AsyncSession],
+    snapshot: Optional[ColumnarSnapshot]
+) -> Table:
+    """
+        Fragt die Daten für ein Land aus dem Snapshot oder der Datenbank ab.
+
+    :param country: Das Land für das die Daten abgefragt werden sollen
+    :param start_year: Startjahr
+    :param session: Die Datenbankverbindung
+    :param snapshot: Der Snapshot (None im Datenbank-Betrieb)
+    :returns: Tabelle mit dem Ergebnis der Abfrage
+    """
+
+    if snapshot is not None:
+        rows = snapshot.country_index.get(country, np.empty(0, dtype=np.int64))
+        if start_year:
+            rows = rows[snapshot.columns["Year"][rows] >= start_year]
+        if not len(rows):
+            raise HTTPException(
+                status_code=404, detail=f"No data found for country: {country}")
+        return snapshot.table(rows, COUNTRY_COLUMNS)
+
     where = (CostOfLivingAndIncome.Country == country)
     if start_year:
         where &= (CostOfLivingAndIncome.Year >= start_year)
 
     query = select(
-        CostOfLivingAndIncome.Country,
-        CostOfLivingAndIncome.Year,
-        CostOfLivingAndIncome.Average_Monthly_Income,
-        CostOfLivingAndIncome.Net_Income,
-        CostOfLivingAndIncome.Housing_Cost,
-        CostOfLivingAndIncome.Healthcare_Cost,
-        CostOfLivingAndIncome.Education_Cost,
-        CostOfLivingAndIncome.Transportation_Cost,
-        CostOfLivingAndIncome.Region,
-        CostOfLivingAndIncome.Savings
+        *[getattr(CostOfLivingAndIncome, column) for column in COUNTRY_COLUMNS]
     ).where(where)
 
     result = await session.execute(query)
@@ -146,14 +411,12 @@ async def get_country_data(
         raise HTTPException(
             status_code=404, detail=f"No data found for country: {country}")
 
-    return [
-        {key: value for key, value in row._mapping.items()}
-        for row in data
-    ]
+    return Table.from_rows(COUNTRY_COLUMNS, data)
 
 @router.get("/regions", response_model=List[str])
 async def get_regions(
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
 ) -> List[str]:
     """
         Ruft alle Regionen ab
@@ -161,7 +424,11 @@ async def get_regions(
     :return: Liste aller Regionennamen
     """
 
-    query = select(distinct(CostOfLivingAndIncome.Region))
+    if snapshot is not None:
+        return snapshot.regions
+
+    query = select(distinct(CostOfLivingAndIncome.Region)).order_by(
+        CostOfLivingAndIncome.Region)
 
     result = await session.execute(query)
     data = result.fetchall()
@@ -175,7 +442,8 @@ async def get_regions(
 # Daniel Schor 
 @router.get("/countries", response_model=List[str])
 async def get_countries(
-    session: AsyncSession = Depends(get_db)
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
 ) -> List[str]:
     """
         Ruft alle Länder ab
@@ -183,7 +451,11 @@ async def get_countries(
     :return: Liste aller Ländernamen
     """
 
-    query = select(distinct(CostOfLivingAndIncome.Country))
+    if snapshot is not None:
+        return snapshot.countries
+
+    query = select(distinct(CostOfLivingAndIncome.Country)).order_by(
+        CostOfLivingAndIncome.Country)
 
     result = await session.execute(query)
     data = result.fetchall()
@@ -195,7 +467,7 @@ async def get_countries(
     return [row[0] for row in data]
 
 
-@router.get("/recommended-countries", response_model=List[dict])
+@router.get("/recommended-countries")
 async def recommended_countries(
     number_people: int = 1,
     number_students: int = 0,
@@ -203,8 +475,12 @@ async def recommended_countries(
     extra_country: str = None,
     start_year: int = 2021,
     region: str = None,
-    session: AsyncSession = Depends(get_db)
-) -> List[dict]:
+    orient: Orient = "records",
+    view: RecommendationView = "rows",
+    media_type: str = Depends(get_media_type),
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
+) -> Response:
     """
         Überprüft anhand von verschiedenen Faktoren, 
         bei welchen Ländern für ein Leben im Ausland das meiste Geld vom Einkommen übrig bleibt.
@@ -225,19 +501,69 @@ async def recommended_countries(
     :param extra_country: Zusätzliches Land
     :param start_year: Startjahr
     :param region: Regionsfilter
+    :param orient: Form der JSON-Antwort, "records" (Liste von Objekten) oder "columns" (eine Liste pro Spalte).
+        Mit "Accept: application/vnd.apache.arrow.stream" wird stattdessen ein Arrow IPC Stream geliefert.
+    :param view: "rows" liefert die Zeilen der Top 3(+1) Länder, "chart" die für das Balkendiagramm aufbereitete
+        Form (siehe recommendation_chart): ein Objekt mit "countries" (nach Rang), "disposable_income" (im Jahr
+        2023, in derselben Reihenfolge) und "rows" (nach Rang und Jahr sortiert, mit Rank, den Basen der gestapelten
+        Kosten, Sum_Costs, Tax und Disposable_Income). Bei Arrow stehen countries und disposable_income in den
+        Metadaten des Schemas.
 
     :return: Liste der Top 3(+1) Länder
     """
 
-    if number_people < 1:
-        raise HTTPException(
-            status_code=400, detail="Healthcare Multiplicator must be greater or equal to 1.")
-    if number_students < 0 or number_workforce < 0:
-        raise HTTPException(
-            status_code=400, detail="Multiplicators must be greater than 0.")
-    if number_students > number_people or number_workforce > number_people:
-        raise HTTPException(
-            status_code=400, detail="Education and Income Multiplicator must be smaller or equal to Healthcare Multiplicator.")
+    _validate_household(number_people, number_students, number_workforce)
+
+    async def compute() -> Table:
+        table = await _recommendations(
+            number_people, number_students, number_workforce, extra_country, start_year, region,
+            session, snapshot)
+
+        return recommendation_chart(table) if view == "chart" else table
+
+    return await _cached_response(
+        ("recommended-countries", number_people, number_students, number_workforce,
+         extra_country, start_year, region, view),
+        _served_version(session, snapshot),
+        media_type,
+        orient,
+        compute
+    )
+
+
+async def _recommendations(
+    number_people: int,
+    number_students: int,
+    number_workforce: float,
+    extra_country: Optional[str],
+    start_year: int,
+    region: Optional[str],
+    session: Optional[AsyncSession],
+    snapshot: Optional[ColumnarSnapshot]
+) -> Table:
+    """
+        Berechnet die Empfehlung aus dem Snapshot oder der Datenbank (Parameter siehe recommended_countries).
+
+    :return: Tabelle der Top 3(+1) Länder
+    """
+
+    if snapshot is not None:
+        rows = np.arange(snapshot.size)
+        if region:
+            rows = snapshot.region_index.get(region, rows[:0])
+            if extra_country:
+                rows = np.union1d(
+                    rows, snapshot.country_index.get(extra_country, rows[:0]))
+        rows = rows[snapshot.columns["Year"][rows] >= start_year]
+
+        if not len(rows):
+            raise HTTPException(status_code=404, detail="No data found.")
+
+        base = snapshot.cached(
+            "recommendation_base", lambda: RecommendationBase(snapshot.columns))
+
+        return score_recommendations(
+            base, number_people, number_students, number_workforce, extra_country, rows)
 
     where = (CostOfLivingAndIncome.Year >= start_year)
     if region:
@@ -248,110 +574,168 @@ async def recommended_countries(
             where &= (CostOfLivingAndIncome.Region == region)
 
     query = select(
-        CostOfLivingAndIncome.Country,
-        CostOfLivingAndIncome.Average_Monthly_Income,
-        CostOfLivingAndIncome.Net_Income,
-        CostOfLivingAndIncome.Housing_Cost,
-        CostOfLivingAndIncome.Tax_Rate,
-        CostOfLivingAndIncome.Healthcare_Cost,
-        CostOfLivingAndIncome.Education_Cost,
-        CostOfLivingAndIncome.Transportation_Cost,
-        CostOfLivingAndIncome.Year,
-        CostOfLivingAndIncome.Region
+        *[getattr(CostOfLivingAndIncome, column) for column in RECOMMENDATION_COLUMNS]
     ).where(where)
 
     result = await session.execute(query)
     data = result.fetchall()
 
     if not data:
+        # Wie im Snapshot-Betrieb, die Antwort hängt nicht von SERVING_MODE ab
         raise HTTPException(
-            status_code=404, detail=f"No data found for {query}.")
-
-    selected_country = None
-    all_countries = []
-    for row in data:
-        current_country = {
-            "Country": row[0],
-            "Average_Monthly_Income": row[1],
-            "Net_Income": row[2],
-            "Housing_Cost": row[3],
-            "Tax_Rate": row[4],
-            "Healthcare_Cost": row[5],
-            "Education_Cost": row[6],
-            "Transportation_Cost": row[7],
-            "Year": row[8],
-            "Region": row[9]
-        }
-
-        current_country["Average_Monthly_Income"] = current_country["Average_Monthly_Income"] * \
-            number_workforce
-        current_country["Net_Income"] = current_country["Net_Income"] * \
-            number_workforce
-        current_country["Healthcare_Cost"] = current_country["Healthcare_Cost"] * \
-            number_people
-        # Ab 3 Leuten wird Transportation doppelt so teurer
-        current_country["Transportation_Cost"] = current_country["Transportation_Cost"] * \
-            1 + (math.floor(number_people / 3))
-        # Ab 5 Leuten wird Housing 25% teurer
-        current_country["Housing_Cost"] = current_country["Housing_Cost"] * \
-            1 + (math.floor(number_people / 6) * 0.25)
-        current_country["Education_Cost"] = current_country["Education_Cost"] * \
-            number_students
-        current_country["Savings"] = current_country["Net_Income"] - current_country["Housing_Cost"] - \
-            current_country["Healthcare_Cost"] - current_country["Education_Cost"] - \
-            current_country["Transportation_Cost"]
-
-        if extra_country and extra_country == current_country["Country"]:
-            current_country["Country"] = f'{
-                current_country["Country"]} (Selected)'
-            if current_country["Year"] == 2023:
-                selected_country = current_country
-
-        all_countries.append(current_country)
-
-    # Filtert länder nach Jahr 2023
-    top_countries = [x for x in all_countries if x["Year"] == 2023]
-
-    # Sortiert die Länder nach Savings
-    top_countries.sort(key=lambda x: x["Savings"], reverse=True)
-
-    # Wählt die Top 4 Länder aus
-    top_countries = top_countries[:4]
-    # Wenn keins der Länder ausgewählt wurde...
-    for i in top_countries:
-        if i["Country"].endswith("(Selected)"):
-            break
-    # ...wird das letzte Land...
-    else:
-        # ... mit dem ausgewählten ersezt
-        if selected_country:
-            top_countries[-1] = selected_country
-        # ... oder entfernt wenn kein Land ausgewählt wurde
-        else:
-            top_countries = top_countries[:3]
+            status_code=404, detail="No data found.")
+
+    return score_recommendations(
+        RecommendationBase.from_rows(data), number_people, number_students, number_workforce, extra_country)
 
-    # -- Hinzufügen der anderen Jahre --
 
-    new_countries = top_countries.copy()
+async def get_cache_stats() -> dict:
+    """
+        Gibt die Zähler des Antwort-Caches zurück (Einträge, Bytes, Hits, Misses, Evictions).
+
+    :return: Die Zähler
+    """
+
+    return response_cache.stats()
+
+
+# Ohne ETag, da sich die Zähler unabhängig von der Datenversion ändern
+router.add_api_route(
+    "/cache-stats", get_cache_stats, methods=["GET"], route_class_override=APIRoute)
+
+
+async def get_version() -> dict:
+    """
+        Gibt die Datenversion zurück, aus der aktuell geantwortet wird. Clients (z.B. der Cache des Frontends)
+        können damit ihre gespeicherten Antworten verwerfen, sobald das ETL neue Daten veröffentlicht hat.
+
+    :return: Die Version (Run-ID bzw. Änderungszeitpunkt) und der Änderungszeitpunkt in Sekunden
+    """
+
+    version = current_version()
+
+    return {"version": version.token, "last_modified": version.mtime_ns // 1_000_000_000}
+
+
+# Ohne ETag, die Antwort ist kaum größer als ein 304 und soll jede neue Version sofort zeigen
+router.add_api_route(
+    "/version", get_version, methods=["GET"], route_class_override=APIRoute)
 
-    # Dict was Country als Key hat und eine Liste von Countries als Value
-    missing_country_years_sorted = {}
-    for country in all_countries:
-        if country["Country"] not in missing_country_years_sorted:
-            missing_country_years_sorted[country["Country"]] = []
-        missing_country_years_sorted[country["Country"]].append(country)
 
-    for top_country in top_countries:
-        # Sortiert die Länder nach jahr für jeden Dict eintrag und speichert diese als Liste
-        previous_years = sorted(
-            [c for c in missing_country_years_sorted.get(
-                top_country["Country"], []) if c["Year"] != 2023],
-            key=lambda x: -x["Year"]
-        )
+class HouseholdScenario(BaseModel):
+    """
+        Ein Haushalt für die Batch-Empfehlung, die Felder entsprechen den Parametern von /recommended-countries.
+
+    :param id: Optionaler Schlüssel des Szenarios im Ergebnis (Standard: Position in der Liste)
+    """
+
+    id: Optional[str] = None
+    number_people: int = 1
+    number_students: int = 0
+    number_workforce: float = 1
+    extra_country: Optional[str] = None
+    start_year: int = 2021
+    region: Optional[str] = None
+
+
+@router.post("/recommended-countries/batch")
+async def recommended_countries_batch(
+    scenarios: List[Any],
+    session: AsyncSession = Depends(get_db),
+    snapshot: Optional[ColumnarSnapshot] = Depends(get_snapshot)
+) -> Dict[str, dict]:
+    """
+        Berechnet die Empfehlungen für mehrere Haushalte auf einmal.
+        Die Ausgangsdaten werden nur einmal abgefragt und für alle Szenarien verwendet.
+        Ungültige Szenarien (auch Einträge, die kein Objekt sind) liefern einen Fehler im Ergebnis, ohne den
+        restlichen Batch abzubrechen. Haben mehrere Szenarien denselben Schlüssel (gleiche id oder eine id gleich
+        der Position eines Szenarios ohne id), wird keines davon berechnet und unter dem Schlüssel ein Fehler
+        mit ihren Positionen geliefert.
 
-        # Sucht den Index des aktuellen Landes
-        insert_index = new_countries.index(top_country) + 1
-        # Fügt die Länder/Jahre in die Liste ein
-        new_countries[insert_index:insert_index] = previous_years
+    :param scenarios: Liste von Szenarien mit den Parametern von /recommended-countries (siehe HouseholdScenario)
 
-    return new_countries
+    :return: Dict mit dem Szenario-Schlüssel als Key und {"status_code", "data"} bzw. {"status_code", "detail"} als Value
+    """
+
+    keys = [
+        str(item["id"]) if isinstance(item, dict) and item.get("id") is not None else str(index)
+        for index, item in enumerate(scenarios)
+    ]
+    positions: Dict[str, List[int]] = {}
+    for index, key in enumerate(keys):
+        positions.setdefault(key, []).append(index)
+
+    results = {}
+    valid_scenarios = []
+    for key, item in zip(keys, scenarios):
+        if len(positions[key]) > 1:
+            results[key] = {"status_code": 422,
+                            "detail": f"Duplicate scenario key {key!r} at positions {positions[key]}."}
+            continue
+
+        try:
+            scenario = HouseholdScenario.model_validate(item)
+            _validate_household(
+                scenario.number_people, scenario.number_students, scenario.number_workforce)
+        except ValidationError as error:
+            results[key] = {"status_code": 422, "detail": error.errors(
+                include_url=False, include_context=False, include_input=False)}
+            continue
+        except HTTPException as error:
+            results[key] = {"status_code": error.status_code, "detail": error.detail}
+            continue
+
+        results[key] = None
+        valid_scenarios.append((key, scenario))
+
+    if valid_scenarios:
+        if snapshot is not None:
+            base = snapshot.cached(
+                "recommendation_base", lambda: RecommendationBase(snapshot.columns))
+        else:
+            # Alle Zeilen ab dem frühesten Startjahr, die Filter der Szenarien werden auf den Ausgangsdaten angewendet
+            query = select(
+                *[getattr(CostOfLivingAndIncome, column) for column in RECOMMENDATION_COLUMNS]
+            ).where(CostOfLivingAndIncome.Year >= min(scenario.start_year for _, scenario in valid_scenarios))
+
+            result = await session.execute(query)
+            data = result.fetchall()
+            base = RecommendationBase.from_rows(data) if data else None
+
+        for key, scenario in valid_scenarios:
+            rows = base.select_rows(
+                scenario.start_year, scenario.region, scenario.extra_country) if base else []
+            if not len(rows):
+                results[key] = {"status_code": 404, "detail": "No data found."}
+                continue
+
+            results[key] = {"status_code": 200, "data": score_recommendations(
+                base, scenario.number_people, scenario.number_students, scenario.number_workforce,
+                scenario.extra_country, rows).records()}
+
+    return results
+
+
+def _validate_household(
+    number_people: int,
+    number_students: int,
+    number_workforce: float
+) -> None:
+    """
+        Prüft die Angaben zum Haushalt.
+
+    :param number_people: Anzahl der Personen
+    :param number_students: Anzahl der Studenten/Schüler
+    :param number_workforce: Anzahl der Berufstätigen
+    :raises HTTPException: Wenn die Angaben ungültig sind
+    """
+
+    if number_people < 1:
+        raise HTTPException(
+            status_code=400, detail="Healthcare Multiplicator must be greater or equal to 1.")
+    if number_students < 0 or number_workforce < 0:
+        raise HTTPException(
+            status_code=400, detail="Multiplicators must be greater than 0.")
+    if number_students > number_people or number_workforce > number_people:
+        raise HTTPException(
+            status_code=400, detail="Education and Income Multiplicator must be smaller or equal to Healthcare Multiplicator.")
@@ -0,0 +1,118 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Sequence, Type
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from .dataset import DatasetVersion
+
+
+def build_etag(
+        version: DatasetVersion,
+        request: Request,
+        vary: Sequence[str] = ()
+) -> str:
+    """
+        Erzeugt einen starken ETag aus der Datenversion, dem Pfad, den normalisierten Query-Parametern
+        und den Headern, von denen die Darstellung der Antwort abhängt.
+
+    :param version: Die Datenversion
+    :param request: Die Anfrage
+    :param vary: Namen der Header, die die Darstellung bestimmen (z.B. Accept)
+    :return: Der ETag (in Anführungszeichen)
+    """
+
+    query = urlencode(sorted(request.query_params.multi_items()))
+    headers = "|".join(request.headers.get(name, "") for name in vary)
+    digest = hashlib.sha256(
+        f"{version.token}|{request.url.path}|{query}|{headers}".encode()).hexdigest()
+
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(
+        request: Request,
+        etag: str,
+        last_modified: int
+) -> bool:
+    """
+        Prüft die Bedingungen If-None-Match bzw. If-Modified-Since der Anfrage.
+        Ist If-None-Match gesetzt, wird If-Modified-Since ignoriert (RFC 9110).
+
+    :param request: Die Anfrage
+    :param etag: Aktueller ETag
+    :param last_modified: Zeitpunkt der letzten Änderung in Sekunden
+    :return: True, wenn der Client die aktuelle Version bereits hat
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def conditional_route(
+        version_provider: Callable[[], DatasetVersion],
+        max_age: int = 0,
+        vary: Sequence[str] = ()
+) -> Type[APIRoute]:
+    """
+        Erstellt eine Route-Klasse für den Router, die GET-Antworten mit ETag, Last-Modified und Cache-Control
+        versieht und bedingte Anfragen mit 304 beantwortet, ohne den Endpunkt auszuführen.
+
+    :param version_provider: Funktion, die die aktuelle Datenversion liefert
+    :param max_age: max-age für Cache-Control in Sekunden
+    :param vary: Header, von denen die Darstellung der Antworten abhängt (gehen in ETag und Vary ein)
+    :return: Die Route-Klasse
+    """
+
+    cache_control = f"public, max-age={max_age}, must-revalidate"
+    vary_header = {"Vary": ", ".join(vary)} if vary else {}
+
+    class ConditionalRoute(APIRoute):
+        """
+            Route mit Unterstützung für bedingte GET-Anfragen.
+        """
+
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+            if "GET" not in self.methods:
+                return handler
+
+            async def conditional_handler(request: Request) -> Response:
+                version = version_provider()
+                etag = build_etag(version, request, vary)
+                last_modified = version.mtime_ns // 1_000_000_000
+                headers = {
+                    "ETag": etag,
+                    "Last-Modified": formatdate(last_modified, usegmt=True),
+                    "Cache-Control": cache_control,
+                    **vary_header,
+                }
+
+                if is_not_modified(request, etag, last_modified):
+                    return Response(status_code=304, headers=headers)
+
+                response = await handler(request)
+
+                # Nur erfolgreiche Antworten erhalten Validatoren, und nur wenn sich die Daten
+                # während der Anfrage nicht geändert haben
+                if response.status_code == 200 and version_provider() == version:
+                    response.headers.update(headers)
+
+                return response
+
+            return conditional_handler
+
+    return ConditionalRoute
@@ -0,0 +1,132 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from .dataset import DatasetVersion
+
+
+class ResponseCache:
+    """
+        Begrenzter In-Process-Cache für fertig serialisierte Antworten mit LRU-Verdrängung.
+        Alle Einträge gehören zu einer Datenversion; ändert sich die Version, wird der Cache geleert.
+
+    :param max_entries: Maximale Anzahl an Einträgen (0 deaktiviert den Cache)
+    :param max_bytes: Maximale Summe der Antwortgrößen in Bytes
+    """
+
+    def __init__(
+            self,
+            max_entries: int,
+            max_bytes: int
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._version: Optional[DatasetVersion] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(
+            self,
+            version: DatasetVersion
+    ) -> None:
+        """
+            Leert den Cache, wenn sich die Datenversion geändert hat. Muss mit gehaltenem Lock aufgerufen werden.
+
+        :param version: Aktuelle Datenversion
+        """
+
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+
+    def get(
+            self,
+            version: DatasetVersion,
+            key: Hashable
+    ) -> Optional[bytes]:
+        """
+            Gibt die gespeicherte Antwort zurück und markiert sie als zuletzt verwendet.
+
+        :param version: Aktuelle Datenversion
+        :param key: Schlüssel der Anfrage
+        :return: Die Antwort oder None
+        """
+
+        with self._lock:
+            self._check_version(version)
+
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return body
+
+    def put(
+            self,
+            version: DatasetVersion,
+            key: Hashable,
+            body: bytes
+    ) -> None:
+        """
+            Speichert eine Antwort und verdrängt die am längsten nicht verwendeten Einträge,
+            bis die Grenzen für Anzahl und Bytes eingehalten werden.
+
+        :param version: Datenversion, aus der die Antwort berechnet wurde
+        :param key: Schlüssel der Anfrage
+        :param body: Die serialisierte Antwort
+        """
+
+        if not self.max_entries or len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            # Antworten einer veralteten Version werden nicht gespeichert
+            if self._version is not None and version != self._version:
+                return
+            self._check_version(version)
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._entries[key] = body
+            self._size += len(body)
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+            Gibt die Zähler des Caches zurück.
+
+        :return: Dict mit Einträgen, Bytes, Grenzen und Hit/Miss/Eviction-Zählern
+        """
+
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "version": self._version.token if self._version else None,
+            }
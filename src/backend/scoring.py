@@ -0,0 +1,271 @@
+import math
+from typing import Dict, Literal, Optional
+
+import numpy as np
+
+from .serialization import Table
+
+# Jahr, nach dem die Länder gerankt werden
+RECOMMENDATION_YEAR = 2023
+
+# Anzahl der Länder in der Empfehlung (Top 3 + ausgewähltes Land)
+TOP_COUNTRIES = 4
+
+# Spalten der Empfehlung in der Reihenfolge der Ausgabe (ohne Savings)
+RECOMMENDATION_COLUMNS = [
+    "Country", "Average_Monthly_Income", "Net_Income", "Housing_Cost", "Tax_Rate", "Healthcare_Cost",
+    "Education_Cost", "Transportation_Cost", "Year", "Region"
+]
+
+# Form der Empfehlung: Zeilen wie von score_recommendations oder aufbereitet für das Balkendiagramm des Frontends
+RecommendationView = Literal["rows", "chart"]
+
+# Kostenarten in der Reihenfolge, in der sie im Balkendiagramm übereinander gestapelt werden
+CHART_COST_COLUMNS = ["Housing_Cost", "Healthcare_Cost", "Education_Cost", "Transportation_Cost"]
+
+# Spalten der Empfehlung für das Balkendiagramm; *_Base ist die Summe der Kosten unter dem jeweiligen Balken
+CHART_COLUMNS = [
+    "Rank", "Country", "Year", "Region", "Average_Monthly_Income", "Net_Income", "Tax", "Tax_Rate",
+    *CHART_COST_COLUMNS, "Healthcare_Base", "Education_Base", "Transportation_Base", "Sum_Costs", "Disposable_Income"
+]
+
+
+class RecommendationBase:
+    """
+        Spaltenbasierte Ausgangsdaten für die Empfehlungen.
+        Enthält einen vorberechneten Index von Land auf den Zeilenbereich in order, in dem die Zeilen
+        eines Landes absteigend nach Jahr sortiert hintereinander liegen.
+
+    :param columns: Dict mit dem Spaltennamen als Key und den Werten als Array (mindestens RECOMMENDATION_COLUMNS)
+    """
+
+    def __init__(
+            self,
+            columns: Dict[str, np.ndarray]
+    ):
+        self.columns = columns
+        self.size = len(columns["Country"])
+
+        # Code je Land in der Reihenfolge des ersten Auftretens (über ein Dict, da NULL nicht mit Text
+        # vergleichbar ist und np.unique daran scheitert)
+        country_codes: Dict[Optional[str], int] = {}
+        codes = np.fromiter(
+            (country_codes.setdefault(country, len(country_codes)) for country in columns["Country"].tolist()),
+            dtype=np.int64, count=self.size)
+
+        # Stabil sortiert nach Land und absteigendem Jahr
+        self.order = np.lexsort((-columns["Year"], codes))
+        bounds = np.searchsorted(codes[self.order], np.arange(len(country_codes) + 1))
+
+        self.country_ranges = {
+            country: (bounds[i], bounds[i + 1]) for country, i in country_codes.items()
+        }
+
+    @classmethod
+    def from_rows(
+            cls,
+            data: list
+    ) -> "RecommendationBase":
+        """
+            Erstellt die Ausgangsdaten aus den Zeilen einer Datenbankabfrage.
+
+        :param data: Zeilen in der Reihenfolge von RECOMMENDATION_COLUMNS
+        :return: Die Ausgangsdaten
+        """
+
+        values = list(zip(*data))
+        columns = {}
+        for column, column_values in zip(RECOMMENDATION_COLUMNS, values):
+            if column in ("Country", "Region"):
+                columns[column] = np.array(column_values, dtype=object)
+            elif column == "Year":
+                columns[column] = np.array(column_values, dtype=np.int64)
+            else:
+                columns[column] = np.array(column_values, dtype=np.float64)
+
+        return cls(columns)
+
+    def select_rows(
+            self,
+            start_year: int,
+            region: Optional[str] = None,
+            extra_country: Optional[str] = None
+    ) -> np.ndarray:
+        """
+            Wählt die Zeilen ab dem Startjahr aus, optional eingeschränkt auf eine Region (und das zusätzliche Land).
+
+        :param start_year: Startjahr
+        :param region: Regionsfilter
+        :param extra_country: Zusätzliches Land, das unabhängig von der Region berücksichtigt wird
+        :return: Aufsteigend sortierte Zeilennummern
+        """
+
+        mask = self.columns["Year"] >= start_year
+        if region:
+            region_mask = self.columns["Region"] == region
+            if extra_country:
+                region_mask |= self.columns["Country"] == extra_country
+            mask &= region_mask
+
+        return np.flatnonzero(mask)
+
+
+def _top_k(
+        values: np.ndarray,
+        k: int
+) -> np.ndarray:
+    """
+        Gibt die Positionen der k größten Werte absteigend sortiert zurück. Gleiche Werte behalten ihre
+        ursprüngliche Reihenfolge (wie eine stabile Sortierung). Es wird nur teilweise sortiert (argpartition).
+
+    :param values: Die Werte
+    :param k: Anzahl der gesuchten Werte
+    :return: Positionen der k größten Werte
+    """
+
+    if len(values) > k:
+        threshold = values[np.argpartition(-values, k - 1)[:k]].min()
+        positions = np.flatnonzero(values >= threshold)
+    else:
+        positions = np.arange(len(values))
+
+    return positions[np.argsort(-values[positions], kind="stable")][:k]
+
+
+def score_recommendations(
+        base: RecommendationBase,
+        number_people: int,
+        number_students: int,
+        number_workforce: float,
+        extra_country: Optional[str] = None,
+        rows: Optional[np.ndarray] = None
+) -> Table:
+    """
+        Berechnet die Savings für alle Länder/Jahre als Spaltenoperationen und stellt die Top 3(+1) Länder
+        mit ihren Vorjahren zusammen.
+
+    :param base: Die Ausgangsdaten
+    :param number_people: Anzahl der Personen
+    :param number_students: Anzahl der Studenten/Schüler
+    :param number_workforce: Anzahl der Berufstätigen (1 = Vollzeit, 0.5 = Teilzeit)
+    :param extra_country: Zusätzliches Land
+    :param rows: Aufsteigend sortierte Zeilennummern, die berücksichtigt werden (None für alle Zeilen)
+
+    :return: Tabelle der Top 3(+1) Länder mit ihren Vorjahren
+    """
+
+    columns = base.columns
+    if rows is None:
+        rows = np.arange(base.size)
+
+    scored = {
+        "Average_Monthly_Income": columns["Average_Monthly_Income"] * number_workforce,
+        "Net_Income": columns["Net_Income"] * number_workforce,
+        "Healthcare_Cost": columns["Healthcare_Cost"] * number_people,
+        # Ab 3 Leuten wird Transportation doppelt so teurer
+        "Transportation_Cost": columns["Transportation_Cost"] * 1 + (math.floor(number_people / 3)),
+        # Ab 5 Leuten wird Housing 25% teurer
+        "Housing_Cost": columns["Housing_Cost"] * 1 + (math.floor(number_people / 6) * 0.25),
+        "Education_Cost": columns["Education_Cost"] * number_students,
+    }
+    scored["Savings"] = scored["Net_Income"] - scored["Housing_Cost"] - \
+        scored["Healthcare_Cost"] - scored["Education_Cost"] - \
+        scored["Transportation_Cost"]
+
+    country = columns["Country"]
+    year = columns["Year"]
+
+    # Länder des Jahres 2023 nach Savings sortieren und die Top 4 auswählen
+    candidates = rows[year[rows] == RECOMMENDATION_YEAR]
+    top_rows = candidates[_top_k(scored["Savings"][candidates], TOP_COUNTRIES)]
+
+    selected_rows = candidates[country[candidates] == extra_country] if extra_country else candidates[:0]
+
+    # Wenn keins der Länder ausgewählt wurde, wird das letzte Land mit dem ausgewählten ersetzt
+    # oder entfernt, wenn kein Land ausgewählt wurde
+    if not extra_country or not (country[top_rows] == extra_country).any():
+        if len(selected_rows):
+            top_rows = np.append(top_rows[:-1], selected_rows[-1])
+        else:
+            top_rows = top_rows[:TOP_COUNTRIES - 1]
+
+    # -- Hinzufügen der anderen Jahre --
+    in_rows = np.zeros(base.size, dtype=bool)
+    in_rows[rows] = True
+
+    output_rows = []
+    for top_row in top_rows:
+        start, stop = base.country_ranges[country[top_row]]
+        previous_years = base.order[start:stop]
+        previous_years = previous_years[in_rows[previous_years] & (year[previous_years] != RECOMMENDATION_YEAR)]
+
+        output_rows.append([top_row])
+        output_rows.append(previous_years)
+
+    output_rows = np.concatenate(output_rows) if output_rows else rows[:0]
+
+    names = RECOMMENDATION_COLUMNS + ["Savings"]
+    values = [
+        (scored[column] if column in scored else columns[column])[output_rows]
+        for column in names
+    ]
+
+    if extra_country:
+        values[0] = [
+            f"{name} (Selected)" if name == extra_country else name for name in values[0].tolist()
+        ]
+
+    return Table(names, values)
+
+
+def recommendation_chart(
+        table: Table
+) -> Table:
+    """
+        Bereitet eine Empfehlung für das gestapelte Balkendiagramm auf. Die Zeilen werden nach Rang und Jahr
+        sortiert und erhalten den Rang, die Basis jeder Kostenart (Summe der Kosten darunter), die Summe der
+        Kosten, die Steuer (Brutto- minus Nettoeinkommen) und das verfügbare Einkommen (Nettoeinkommen minus
+        Summe der Kosten). Die Metadaten enthalten die Länder in der Reihenfolge ihres Rangs und ihr verfügbares
+        Einkommen im Jahr RECOMMENDATION_YEAR.
+
+    :param table: Die Empfehlung von score_recommendations (Länder nach Rang, je Land zuerst RECOMMENDATION_YEAR)
+
+    :return: Tabelle mit den Spalten CHART_COLUMNS und den Metadaten "countries" und "disposable_income"
+    """
+
+    values = dict(zip(table.columns, table.values))
+    country = np.asarray(values["Country"], dtype=object)
+
+    # Rang: Reihenfolge, in der die Länder in der Empfehlung zum ersten Mal vorkommen
+    ranks: Dict[str, int] = {}
+    for name in country.tolist():
+        ranks.setdefault(name, len(ranks) + 1)
+
+    rank = np.array([ranks[name] for name in country.tolist()], dtype=np.int64)
+    year = np.asarray(values["Year"], dtype=np.int64)
+    order = np.lexsort((year, rank))
+
+    costs = np.column_stack(
+        [np.asarray(values[column], dtype=np.float64) for column in CHART_COST_COLUMNS]).reshape(-1, 4)[order]
+    cumulative_costs = costs.cumsum(axis=1)
+
+    gross_income = np.asarray(values["Average_Monthly_Income"], dtype=np.float64)[order]
+    net_income = np.asarray(values["Net_Income"], dtype=np.float64)[order]
+    disposable_income = net_income - cumulative_costs[:, -1]
+
+    country = country[order]
+    year = year[order]
+
+    latest = year == RECOMMENDATION_YEAR
+    latest_disposable_income = dict(zip(country[latest].tolist(), disposable_income[latest].tolist()))
+
+    chart_values = [
+        rank[order], country, year, np.asarray(values["Region"], dtype=object)[order], gross_income, net_income,
+        gross_income - net_income, np.asarray(values["Tax_Rate"], dtype=np.float64)[order],
+        *costs.T, *cumulative_costs[:, :-1].T, cumulative_costs[:, -1], disposable_income
+    ]
+
+    return Table(CHART_COLUMNS, chart_values, {
+        "countries": list(ranks),
+        "disposable_income": [latest_disposable_income.get(name) for name in ranks],
+    })
@@ -0,0 +1,222 @@
+import json
+from typing import Any, List, Literal, Optional, Sequence
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from .settings import FAST_JSON
+
+# Form der Antwort: Liste von Zeilen-Objekten oder ein Objekt mit einer Liste pro Spalte
+Orient = Literal["records", "columns"]
+
+# Media Types der unterstützten Antwortformate
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def to_python_list(
+        values: Sequence
+) -> list:
+    """
+        Wandelt eine Spalte in eine Liste aus Python-Werten um, NaN wird dabei wie NULL in SQL zu None.
+
+    :param values: Die Spalte (Liste oder NumPy-Array)
+    :return: Liste der Werte
+    """
+
+    if not isinstance(values, np.ndarray):
+        return list(values)
+
+    if values.dtype.kind == "f" and np.isnan(values).any():
+        return [None if value != value else value for value in values.tolist()]
+
+    return values.tolist()
+
+
+class Table:
+    """
+        Spaltenorientiertes Ergebnis einer Abfrage, das ohne Umweg über Dictionaries serialisiert werden kann.
+
+    :param columns: Namen der Spalten
+    :param values: Werte pro Spalte (Listen oder NumPy-Arrays gleicher Länge)
+    :param metadata: Zusätzliche Felder der Antwort (JSON-kompatibel). Ist es gesetzt, wird die JSON-Antwort ein
+        Objekt mit diesen Feldern und der Tabelle unter "rows", bei Arrow stehen die Felder in den Metadaten des Schemas.
+    """
+
+    def __init__(
+            self,
+            columns: List[str],
+            values: List[Sequence],
+            metadata: Optional[dict] = None
+    ):
+        self.columns = columns
+        self.values = values
+        self.metadata = metadata
+
+    @classmethod
+    def from_rows(
+            cls,
+            columns: List[str],
+            rows: Sequence[Sequence]
+    ) -> "Table":
+        """
+            Erstellt die Tabelle aus den Zeilen einer Datenbankabfrage.
+
+        :param columns: Namen der Spalten
+        :param rows: Die Zeilen
+        :return: Die Tabelle
+        """
+
+        values = [list(column) for column in zip(*rows)] if rows else [[] for _ in columns]
+
+        return cls(columns, values)
+
+    def __len__(self) -> int:
+        return len(self.values[0]) if self.values else 0
+
+    def records(self) -> List[dict]:
+        """
+            Gibt die Tabelle als Liste von Dictionaries zurück.
+
+        :return: Liste von Dictionaries
+        """
+
+        return [
+            dict(zip(self.columns, row))
+            for row in zip(*[to_python_list(values) for values in self.values])
+        ]
+
+
+def dumps_json(
+        content: Any
+) -> bytes:
+    """
+        Serialisiert den Inhalt zu JSON-Bytes im selben Format wie die JSONResponse von FastAPI.
+        Mit FAST_JSON wird orjson verwendet, das zusätzlich NumPy-Arrays direkt serialisiert.
+
+    :param content: Der Inhalt (Listen, Dicts und einfache Werte)
+    :return: Die JSON-Bytes
+    """
+
+    if FAST_JSON and orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_table(
+        table: Table,
+        orient: Orient = "records"
+) -> bytes:
+    """
+        Serialisiert eine Tabelle zu JSON-Bytes.
+
+    :param table: Die Tabelle
+    :param orient: "records" (Liste von Objekten) oder "columns" (ein Objekt mit einer Liste pro Spalte)
+    :return: Die JSON-Bytes
+    """
+
+    if orient == "columns":
+        if FAST_JSON and orjson is not None:
+            # Zahlen-Arrays serialisiert orjson direkt, nur Text-Spalten werden umgewandelt
+            content = {
+                column: values if isinstance(values, np.ndarray) and values.dtype != object
+                else to_python_list(values)
+                for column, values in zip(table.columns, table.values)
+            }
+        else:
+            content = {
+                column: to_python_list(values) for column, values in zip(table.columns, table.values)
+            }
+    else:
+        content = table.records()
+
+    if table.metadata is not None:
+        content = {**table.metadata, "rows": content}
+
+    return dumps_json(content)
+
+
+def negotiate_media_type(
+        accept: Optional[str]
+) -> str:
+    """
+        Wählt das Antwortformat anhand des Accept-Headers. Arrow wird nur geliefert, wenn der Client es
+        ausdrücklich anfordert und pyarrow installiert ist, sonst JSON.
+
+    :param accept: Der Accept-Header der Anfrage
+    :return: Der Media Type der Antwort
+    """
+
+    if pa is None or not accept:
+        return JSON_MEDIA_TYPE
+
+    for entry in accept.split(","):
+        media_type, *parameters = [part.strip() for part in entry.split(";")]
+        if media_type == ARROW_MEDIA_TYPE and "q=0" not in parameters:
+            return ARROW_MEDIA_TYPE
+
+    return JSON_MEDIA_TYPE
+
+
+def encode_arrow(
+        table: Table
+) -> bytes:
+    """
+        Serialisiert eine Tabelle als Arrow IPC Stream. NumPy-Spalten werden dabei ohne Umweg über
+        Python-Objekte übernommen, die Metadaten der Tabelle als JSON in die Metadaten des Schemas.
+
+    :param table: Die Tabelle
+    :return: Die Bytes des Arrow-Streams
+    """
+
+    arrow_table = pa.table({
+        column: pa.array(values if isinstance(values, np.ndarray) and values.dtype != object
+                         else to_python_list(values))
+        for column, values in zip(table.columns, table.values)
+    })
+
+    if table.metadata is not None:
+        arrow_table = arrow_table.replace_schema_metadata(
+            {key: json.dumps(value) for key, value in table.metadata.items()})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+
+    return sink.getvalue().to_pybytes()
+
+
+def encode_response(
+        table: Table,
+        media_type: str,
+        orient: Orient = "records"
+) -> bytes:
+    """
+        Serialisiert eine Tabelle im ausgehandelten Format.
+
+    :param table: Die Tabelle
+    :param media_type: JSON_MEDIA_TYPE oder ARROW_MEDIA_TYPE
+    :param orient: Form der JSON-Antwort (wird bei Arrow ignoriert, Arrow ist immer spaltenorientiert)
+    :return: Die Bytes der Antwort
+    """
+
+    if media_type == ARROW_MEDIA_TYPE:
+        return encode_arrow(table)
+
+    return encode_table(table, orient)
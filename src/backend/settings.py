@@ -0,0 +1,39 @@
+import os
+
+# Einstellungen des Backends, überschreibbar über Umgebungsvariablen
+
+# Absoluter Pfad zur Datenbank
+DATABASE_PATH = os.environ.get(
+    "DATABASE_PATH",
+    os.path.join(os.getcwd(), 'src', 'database', 'CostOfLivingAndIncome.db')
+)
+
+# Betriebsart: "database" (jede Anfrage geht an SQLite) oder "snapshot" (Antworten aus dem Arbeitsspeicher)
+SERVING_MODE = os.environ.get("SERVING_MODE", "database")
+
+# Mindestabstand in Sekunden zwischen zwei Prüfungen auf eine neue Datenversion
+VERSION_CHECK_INTERVAL = float(os.environ.get("VERSION_CHECK_INTERVAL", 1.0))
+
+# max-age in Sekunden für den Cache-Control-Header der GET-Endpunkte
+CACHE_MAX_AGE = int(os.environ.get("CACHE_MAX_AGE", 0))
+
+# Grenzen des Antwort-Caches für /recommended-countries und /country-information (0 Einträge deaktiviert ihn)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Schneller JSON-Encoder (orjson) für die Datenendpunkte, falls installiert
+FAST_JSON = os.environ.get("FAST_JSON", "0") == "1"
+
+# Verbindungspool der Datenbank (dauerhaft offene und zusätzliche Verbindungen)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+
+# Alle SQL-Anweisungen loggen
+DB_ECHO = os.environ.get("DB_ECHO", "0") == "1"
+
+# Datenbank als unveränderlich öffnen (nur wenn die Datei nach dem ETL nicht mehr geschrieben wird)
+DB_IMMUTABLE = os.environ.get("DB_IMMUTABLE", "0") == "1"
+
+# Pragmas jeder Verbindung: Memory-Mapping in Bytes und Seiten-Cache (negativ in KiB)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
@@ -0,0 +1,289 @@
+import logging
+import threading
+from contextlib import closing
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .dataset import DatasetVersion, DatasetWatcher, connect_read_only
+from .serialization import Table
+
+logger = logging.getLogger(__name__)
+
+
+def _factorize(
+        values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Wie np.unique(values, return_inverse=True), aber auch für Text-Spalten mit NULL (None lässt sich nicht mit
+        Text vergleichen). None steht wie bei ORDER BY in SQLite vor allen anderen Werten.
+
+    :param values: Die Spalte
+    :return: Sortierte eindeutige Werte und der Code (Position in diesen) je Zeile
+    """
+
+    missing = np.equal(values, None) if values.dtype == object else np.zeros(len(values), dtype=bool)
+    if not missing.any():
+        return np.unique(values, return_inverse=True)
+
+    uniques, inverse = np.unique(values[~missing], return_inverse=True)
+    codes = np.zeros(len(values), dtype=np.int64)
+    codes[~missing] = inverse + 1
+
+    return np.concatenate([np.array([None], dtype=object), uniques]), codes
+
+
+def _build_index(
+        values: np.ndarray
+) -> Dict[Optional[str], np.ndarray]:
+    """
+        Erstellt einen Index von Wert auf Zeilennummern. Die Reihenfolge der Schlüssel entspricht dem ersten Auftreten.
+        Zeilen mit NULL stehen unter dem Schlüssel None.
+
+    :param values: Spalte, nach der indiziert wird
+    :return: Dict mit dem Wert als Key und den Zeilennummern als Array
+    """
+
+    uniques, inverse = _factorize(values)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(uniques) + 1))
+
+    # Erste Zeile jedes Werts, um die Schlüssel nach ihrem ersten Auftreten zu ordnen
+    first = order[bounds[:-1]]
+
+    return {
+        uniques[i]: order[bounds[i]:bounds[i + 1]]
+        for i in np.argsort(first, kind="stable")
+    }
+
+
+class ColumnarSnapshot:
+    """
+        Unveränderlicher, spaltenbasierter Abzug einer Tabelle im Arbeitsspeicher.
+        Jede Spalte liegt als NumPy-Array vor, zusätzlich gibt es Indizes pro Land und pro Region.
+
+    :param columns: Dict mit dem Spaltennamen als Key und den Werten als Array (in Tabellenreihenfolge)
+    :param version: Datenversion, aus der der Snapshot geladen wurde
+    """
+
+    def __init__(
+            self,
+            columns: Dict[str, np.ndarray],
+            version: DatasetVersion
+    ):
+        self.columns = columns
+        self.version = version
+        self.size = len(columns["Country"])
+
+        self.country_index = _build_index(columns["Country"])
+        self.region_index = _build_index(columns["Region"])
+
+        # Alphabetisch sortiert, wie die Abfragen im Datenbank-Betrieb (ohne NULL, das kein Name ist)
+        self.countries: List[str] = sorted(key for key in self.country_index if key is not None)
+        self.regions: List[str] = sorted(key for key in self.region_index if key is not None)
+
+        self._derived = {}
+
+    @classmethod
+    def load(
+            cls,
+            db_path: str,
+            table_name: str,
+            version: DatasetVersion
+    ) -> "ColumnarSnapshot":
+        """
+            Lädt die komplette Tabelle aus der Datenbank.
+
+        :param db_path: Pfad zur Datenbank
+        :param table_name: Name der Tabelle
+        :param version: Datenversion, die geladen wird
+        :return: Der Snapshot
+        """
+
+        with closing(connect_read_only(db_path)) as connection:
+            cursor = connection.execute(
+                f'SELECT * FROM "{table_name}" ORDER BY rowid')
+            names = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+
+        if not rows:
+            raise ValueError(f"Table {table_name} is empty.")
+
+        columns = {}
+        for name, values in zip(names, zip(*rows)):
+            sample = next((value for value in values if value is not None), None)
+            if isinstance(sample, str):
+                columns[name] = np.array(values, dtype=object)
+            elif isinstance(sample, int) and None not in values:
+                columns[name] = np.array(values, dtype=np.int64)
+            else:
+                columns[name] = np.array(values, dtype=np.float64)
+
+        return cls(columns, version)
+
+    def cached(
+            self,
+            key: Hashable,
+            factory: Callable[[], Any]
+    ) -> Any:
+        """
+            Gibt eine aus dem Snapshot abgeleitete Struktur zurück und berechnet sie nur beim ersten Aufruf.
+            Da der Snapshot unveränderlich ist, bleibt das Ergebnis bis zum Austausch des Snapshots gültig.
+
+        :param key: Schlüssel der abgeleiteten Struktur
+        :param factory: Funktion, die die Struktur berechnet
+        :return: Die abgeleitete Struktur
+        """
+
+        if key not in self._derived:
+            self._derived[key] = factory()
+
+        return self._derived[key]
+
+    def table(
+            self,
+            rows: Optional[np.ndarray],
+            columns: List[str]
+    ) -> Table:
+        """
+            Gibt die ausgewählten Zeilen und Spalten als Tabelle zurück.
+
+        :param rows: Zeilennummern (None für alle Zeilen)
+        :param columns: Spalten, die ausgegeben werden
+        :return: Die Tabelle
+        """
+
+        return Table(columns, [
+            self.columns[column] if rows is None else self.columns[column][rows]
+            for column in columns
+        ])
+
+    def group_means(
+            self,
+            group_by: List[str],
+            columns: List[str]
+    ) -> Table:
+        """
+            Berechnet die Mittelwerte der Spalten je Gruppe, sortiert nach den Gruppenspalten (wie GROUP BY mit AVG()).
+            Das Ergebnis wird pro Spaltenauswahl nur einmal berechnet.
+
+        :param group_by: Spalten, nach denen gruppiert wird
+        :param columns: Spalten, deren Mittelwert berechnet wird
+        :return: Tabelle mit den Gruppenspalten und den Mittelwerten
+        """
+
+        return self.cached(
+            ("group_means", tuple(group_by), tuple(columns)),
+            lambda: self._compute_group_means(group_by, columns))
+
+    def _compute_group_means(
+            self,
+            group_by: List[str],
+            columns: List[str]
+    ) -> Table:
+        """
+            Berechnet die Mittelwerte der Spalten je Gruppe.
+
+        :param group_by: Spalten, nach denen gruppiert wird
+        :param columns: Spalten, deren Mittelwert berechnet wird
+        :return: Tabelle mit den Gruppenspalten und den Mittelwerten
+        """
+
+        # Gruppennummer aus den Codes der einzelnen Gruppenspalten zusammensetzen
+        group_code = np.zeros(self.size, dtype=np.int64)
+        group_uniques = []
+        for column in group_by:
+            uniques, inverse = _factorize(self.columns[column])
+            group_code = group_code * len(uniques) + inverse
+            group_uniques.append(uniques)
+
+        codes, group = np.unique(group_code, return_inverse=True)
+
+        result = {}
+        for column, uniques in reversed(list(zip(group_by, group_uniques))):
+            result[column] = uniques[codes % len(uniques)]
+            codes = codes // len(uniques)
+
+        for column in columns:
+            values = self.columns[column].astype(np.float64)
+            valid = ~np.isnan(values)
+            sums = np.bincount(group, weights=np.where(valid, values, 0.0))
+            counts = np.bincount(group, weights=valid)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[column] = np.where(counts > 0, sums / counts, np.nan)
+
+        names = list(group_by) + list(columns)
+
+        return Table(names, [np.asarray(result[name]) for name in names])
+
+
+class SnapshotStore:
+    """
+        Hält den aktuellen Snapshot und lädt ihn neu, sobald sich die Datenversion (Datei, mtime oder Run-ID) ändert.
+        Das Neuladen passiert in einem Hintergrund-Thread; laufende Anfragen arbeiten mit dem alten Snapshot weiter,
+        bis der neue per Referenzzuweisung atomar eingesetzt wird.
+
+    :param table_name: Name der Tabelle
+    :param watcher: Beobachter der Datenversion (liefert auch den Pfad der aktiven Datenbankdatei)
+    """
+
+    def __init__(
+            self,
+            table_name: str,
+            watcher: DatasetWatcher
+    ):
+        self.table_name = table_name
+        self.watcher = watcher
+        self._snapshot: Optional[ColumnarSnapshot] = None
+        self._failed_version: Optional[DatasetVersion] = None
+        self._reload_lock = threading.Lock()
+
+    def load(self) -> ColumnarSnapshot:
+        """
+            Lädt den Snapshot synchron (beim Start des Servers).
+
+        :return: Der geladene Snapshot
+        """
+
+        with self._reload_lock:
+            version = self.watcher.current()
+            self._snapshot = ColumnarSnapshot.load(version.path, self.table_name, version)
+
+        return self._snapshot
+
+    def get(self) -> ColumnarSnapshot:
+        """
+            Gibt den aktuellen Snapshot zurück und stößt bei einer neuen Datenversion das Neuladen an.
+
+        :return: Der aktuelle Snapshot
+        """
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.load()
+
+        version = self.watcher.current()
+        if version not in (snapshot.version, self._failed_version) and self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, args=(version,), daemon=True).start()
+
+        return snapshot
+
+    def _reload(
+            self,
+            version: DatasetVersion
+    ) -> None:
+        """
+            Lädt den Snapshot neu und tauscht ihn aus. Schlägt das Laden fehl (z.B. weil das ETL gerade schreibt),
+            bleibt der alte Snapshot aktiv, bis sich die Datenversion erneut ändert.
+
+        :param version: Die Datenversion, die geladen wird
+        """
+
+        try:
+            self._snapshot = ColumnarSnapshot.load(version.path, self.table_name, version)
+            logger.info("Snapshot reloaded for version %s", version.token)
+        except Exception:
+            self._failed_version = version
+            logger.exception("Snapshot reload failed, keeping previous snapshot")
+        finally:
+            self._reload_lock.release()
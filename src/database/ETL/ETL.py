@@ -1,9 +1,138 @@
+import argparse
+import glob
+import hashlib
 import os
 import sqlite3
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Iterator, List, Optional
+
+import numpy as np
 import pandas as pd
 from tabulate import tabulate
 import yaml
 
+from metrics import RunMetrics, measure
+
+# Spalten, deren Mittelwerte je Region und Jahr in der Tabelle RegionYearAggregate vorberechnet werden
+REGION_AGGREGATE_COLUMNS = [
+    "Average_Monthly_Income", "Net_Income", "Cost_of_Living", "Housing_Cost_Percentage", "Housing_Cost",
+    "Savings", "Healthcare_Cost", "Education_Cost", "Transportation_Cost", "Sum_Costs", "Tax_Rate"
+]
+
+# Primärschlüssel und Indizes der Tabelle mit den Länderdaten (Name des Index: Spalten)
+PRIMARY_KEY = ["Country", "Year"]
+TABLE_INDEXES = {
+    "Year_Region_Country": ["Year", "Region", "Country"],
+    "Region_Year": ["Region", "Year"],
+}
+
+# Tabellen für den inkrementellen Modus: Fingerabdruck je (Country, Year) der Eingabe und je Quelldatei
+MANIFEST_TABLE = "ETL_Manifest"
+SOURCE_TABLE = "ETL_Source"
+
+
+
+def interpolate_linear(
+        values: np.ndarray
+) -> np.ndarray:
+    """
+        Füllt fehlende Werte (NaN) entlang der zweiten Achse eines Arrays der Form (Land, Jahr, Spalte)
+        mit linearer Interpolation. Werte vor dem ersten bzw. nach dem letzten vorhandenen Wert werden mit
+        diesem aufgefüllt, Reihen ohne einen einzigen Wert bleiben leer. Die Rechnung entspricht np.interp,
+        die Ergebnisse sind also identisch zu Series.interpolate(method="linear", limit_direction="both").
+
+    :param values: Array der Form (Land, Jahr, Spalte)
+    :return: Array gleicher Form mit den aufgefüllten Werten
+    """
+
+    n_years = values.shape[1]
+    positions = np.arange(n_years).reshape(1, n_years, 1)
+    valid = ~np.isnan(values)
+
+    # Position des letzten vorhandenen Werts davor und des nächsten vorhandenen Werts danach
+    previous = np.maximum.accumulate(np.where(valid, positions, -1), axis=1)
+    following = np.minimum.accumulate(np.where(valid, positions, n_years)[:, ::-1], axis=1)[:, ::-1]
+
+    has_previous = previous >= 0
+    has_following = following < n_years
+    previous_values = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+    following_values = np.take_along_axis(values, np.minimum(following, n_years - 1), axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (following_values - previous_values) / (following - previous)
+        interpolated = slope * (positions - previous) + previous_values
+
+    filled = np.where(has_previous & has_following, interpolated,
+                      np.where(has_previous, previous_values, following_values))
+
+    return np.where(valid, values, filled)
+
+
+def file_hash(
+        path: str
+) -> str:
+    """
+        Berechnet den SHA-256 Hash einer Datei (blockweise gelesen).
+
+    :param path: Pfad zur Datei
+    :return: Der Hash als Hex-String
+    """
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def row_hashes(
+        df: pd.DataFrame
+) -> pd.Series:
+    """
+        Berechnet einen Fingerabdruck je (Country, Year) aus allen Eingabezeilen der Gruppe.
+        Die Reihenfolge der Zeilen innerhalb einer Gruppe geht mit ein, da sie den Mittelwert beeinflussen kann.
+
+    :param df: Die eingelesenen Rohdaten
+    :return: Hash (int64) mit (Country, Year) als Index
+    """
+
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    positions = df.groupby(["Country", "Year"]).cumcount().to_numpy()
+    combined = pd.util.hash_pandas_object(
+        pd.DataFrame({"Hash": hashes, "Position": positions}), index=False)
+
+    # Summe mit Überlauf (modulo 2^64), gespeichert als vorzeichenbehaftete Ganzzahl für SQLite
+    grouped = combined.groupby([df["Country"].to_numpy(), df["Year"].to_numpy()]).sum()
+
+    return pd.Series(grouped.to_numpy().view("int64"), index=grouped.index.set_names(["Country", "Year"]))
+
+
+def complete_partition(
+        partition: pd.DataFrame,
+        year_range: range,
+        region_dict: Optional[dict]
+) -> pd.DataFrame:
+    """
+        Schließt die Transformation für einen Teil der Länder ab (Schritte 7-9). Läuft in einem Prozess
+        des Prozess-Pools und muss daher eine Funktion auf Modulebene sein.
+
+    :param partition: Gruppierte Daten eines Teils der Länder
+    :param year_range: Jahre, für die jedes Land eine Zeile erhält
+    :param region_dict: Region je Land (None lässt Schritt 9 aus)
+    :return: Die fertig transformierten Daten dieser Länder
+    """
+
+    handler = ETL_Handler.wrap(partition, year_range.start, year_range.stop - 1)
+    handler.complete(region_dict)
+
+    return handler._df
+
+
 # Davide Pedergnana
 class ETL_Handler:
     """
@@ -11,25 +140,132 @@ class ETL_Handler:
 
     :param _csv_path: Pfad zur CSV-Datei
     :param _df: DataFrame mit den Daten aus der CSV-Datei
+    :param _year_range: Jahre, für die jedes Land eine Zeile erhält
+    :param _chunk_size: Anzahl Zeilen pro Block beim blockweisen Einlesen (None liest die Datei auf einmal)
+    :param _float32: Zahlenspalten beim blockweisen Einlesen als float32 statt float64 lesen
+    :param _workers: Anzahl Prozesse für die Schritte 7-9 (None oder 1 rechnet im eigenen Prozess)
+    :param _partitions_per_worker: Anzahl Teile je Prozess, in die die Länder aufgeteilt werden
+    :param _metrics: Kennzahlen je Stufe (None erfasst keine)
     """
 
     def __init__(
             self,
-            _csv_path: str
+            _csv_path: str,
+            start_year: int = 2000,
+            end_year: int = 2023,
+            chunk_size: Optional[int] = None,
+            float32: bool = False,
+            workers: Optional[int] = None,
+            partitions_per_worker: int = 4,
+            metrics: Optional[RunMetrics] = None
     ):
         """
             Initialisiert die Klasse mit dem Pfad zur CSV-Datei.
 
         :param _csv_path: Pfad zur CSV-Datei, welche die Datenbasis enthält
+        :param start_year: Erstes Jahr der Tabelle
+        :param end_year: Letztes Jahr der Tabelle (einschließlich)
+        :param chunk_size: Datei blockweise mit dieser Anzahl Zeilen verarbeiten (für sehr große CSV-Dateien)
+        :param float32: Zahlenspalten beim blockweisen Einlesen als float32 lesen (halber Speicher, geringere Genauigkeit)
+        :param workers: Schritte 7-9 je Land parallel in so vielen Prozessen ausführen
+        :param partitions_per_worker: Anzahl Teile je Prozess (wenige große Teile halten den Aufwand für das
+            Übertragen der Daten zwischen den Prozessen klein, mehrere Teile je Prozess gleichen die Last aus)
+        :param metrics: Kennzahlen je Stufe erfassen (siehe metrics.py)
         """
         self._csv_path = os.path.abspath(_csv_path)
-        self.extract()
+        self._year_range = range(start_year, end_year + 1)
+        self._chunk_size = chunk_size
+        self._float32 = float32
+        self._workers = workers
+        self._partitions_per_worker = partitions_per_worker
+        self._metrics = metrics
+
+        if chunk_size:
+            self.transform_chunked()
+            return
+
+        with self.measure("extract"):
+            self.extract()
 
-        # Entfernt überflüssige Leerzeichen aus den Spaltennamen
-        self._df.columns = self._df.columns.str.strip()
+            # Entfernt überflüssige Leerzeichen aus den Spaltennamen
+            self._df.columns = self._df.columns.str.strip()
 
         self.transform()
 
+    @classmethod
+    def from_dataframe(
+            cls,
+            df: pd.DataFrame,
+            start_year: int = 2000,
+            end_year: int = 2023,
+            workers: Optional[int] = None,
+            metrics: Optional[RunMetrics] = None
+    ) -> "ETL_Handler":
+        """
+            Erstellt den Handler aus bereits eingelesenen Rohdaten und transformiert diese.
+
+        :param df: Die Rohdaten (Spalten wie in der CSV-Datei)
+        :param start_year: Erstes Jahr der Tabelle
+        :param end_year: Letztes Jahr der Tabelle (einschließlich)
+        :param workers: Schritte 7-9 je Land parallel in so vielen Prozessen ausführen
+        :param metrics: Kennzahlen je Stufe erfassen
+        :return: Der Handler mit den transformierten Daten
+        """
+
+        handler = cls.wrap(df.copy(), start_year, end_year, workers, metrics=metrics)
+        handler._df.columns = handler._df.columns.str.strip()
+        handler.transform()
+
+        return handler
+
+    @classmethod
+    def wrap(
+            cls,
+            df: Optional[pd.DataFrame],
+            start_year: int = 2000,
+            end_year: int = 2023,
+            workers: Optional[int] = None,
+            csv_path: Optional[str] = None,
+            metrics: Optional[RunMetrics] = None
+    ) -> "ETL_Handler":
+        """
+            Erstellt den Handler für vorhandene Daten, ohne etwas einzulesen oder zu transformieren.
+            So lassen sich einzelne Schritte getrennt ausführen (siehe pipeline.py).
+
+        :param df: Die Daten (werden nicht kopiert)
+        :param start_year: Erstes Jahr der Tabelle
+        :param end_year: Letztes Jahr der Tabelle (einschließlich)
+        :param workers: Schritte 7-9 je Land parallel in so vielen Prozessen ausführen
+        :param csv_path: Pfad zur CSV-Datei für extract
+        :param metrics: Kennzahlen je Stufe erfassen
+        :return: Der Handler
+        """
+
+        handler = cls.__new__(cls)
+        handler._csv_path = None if csv_path is None else os.path.abspath(csv_path)
+        handler._year_range = range(start_year, end_year + 1)
+        handler._chunk_size = None
+        handler._float32 = False
+        handler._workers = workers
+        handler._partitions_per_worker = 4
+        handler._metrics = metrics
+        handler._df = df
+
+        return handler
+
+    def measure(
+            self,
+            name: str
+    ) -> ContextManager:
+        """
+            Misst einen Schritt mit den Kennzahlen des Handlers (ohne Kennzahlen ohne Aufwand).
+
+        :param name: Name des Schritts
+        :return: Der Kontextmanager
+        """
+
+        return measure(self._metrics, name, lambda: getattr(self, "_df", None))
+
 # extract ---------------------------------------------------------------------------------------------------------
 
     def extract(self) -> None:
@@ -43,6 +279,34 @@ class ETL_Handler:
             sep=",",
             encoding="utf-8-sig"
         )
+
+    def extract_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+            Liest die CSV-Datei blockweise mit expliziten Datentypen: Country und Region als Kategorien,
+            Year als Ganzzahl mit NULL (Int64, leere Jahre bleiben wie beim Einlesen in einem Stück erhalten und
+            fallen erst bei der Gruppierung weg) und alle übrigen Spalten als float32 bzw. float64.
+
+        :return: Iterator über die Blöcke (mit bereinigten Spaltennamen)
+        """
+
+        header = pd.read_csv(self._csv_path, sep=",", encoding="utf-8-sig", nrows=0).columns
+        float_type = "float32" if self._float32 else "float64"
+        dtypes = {
+            column: {"Country": "category", "Region": "category", "Year": "Int64"}.get(column.strip(), float_type)
+            for column in header
+        }
+
+        with pd.read_csv(
+            self._csv_path,
+            sep=",",
+            encoding="utf-8-sig",
+            dtype=dtypes,
+            chunksize=self._chunk_size
+        ) as reader:
+            for chunk in reader:
+                # Entfernt überflüssige Leerzeichen aus den Spaltennamen
+                chunk.columns = chunk.columns.str.strip()
+                yield chunk
 # Daniel Schor und Esrom Johannes
 # transform ---------------------------------------------------------------------------------------------------------
 
@@ -55,124 +319,308 @@ class ETL_Handler:
             3. Berechnung der Dollar-Werte
             4. Berechnung der Summe aller Kosten
             5. Speichern der Regionen
-            6. Gruppierung nach Land und Jahr (aggregieren anhand des Mittelwerts)
+            6. Gruppierung nach Land und Jahr (aggregieren anhand des Mittelwerts) und Ordnen der Spalten
             7. Sortierung nach Land und Jahr
             8. Füllen fehlender Werte mit linearer Interpolation
             9. Füllen der Regionen
         """
 
+        # 1.-4.
+        self.calc_row_values()
+
+        # 5.
+        with self.measure("5 regions"):
+            region_dict = self._df.groupby("Country")["Region"].first().to_dict()
+
+        # 6.
+        with self.measure("6 group"):
+            self._df = self._df.groupby(
+                ["Country", "Year"], as_index=False).mean(numeric_only=True)
+            self.order_columns()
+
+        # 7.-9.
+        self.complete(region_dict)
+
+    def transform_chunked(self) -> None:
+        """
+            Liest und transformiert die CSV-Datei blockweise. Die Schritte 1-4 laufen pro Block, für Schritt 6
+            werden nur die laufenden Summen und Anzahlen je (Country, Year) behalten. Der Speicherbedarf hängt
+            damit von der Anzahl der Gruppen ab und nicht von der Anzahl der Zeilen der Datei.
+        """
+
+        sums = None
+        counts = None
+        region_dict = {}
+        chunks = self.extract_chunks()
+
+        while True:
+            self._df = None
+            with self.measure("extract"):
+                self._df = next(chunks, None)
+            if self._df is None:
+                break
+
+            # 1.-4.
+            self.calc_row_values()
+
+            # 5. (die erste Region eines Landes in der Datei gewinnt)
+            with self.measure("5 regions"):
+                for country, region in self._df.groupby(
+                        "Country", observed=True, sort=False)["Region"].first().dropna().items():
+                    region_dict.setdefault(country, region)
+
+            # 6. Teilsummen und Anzahl vorhandener Werte je Gruppe
+            with self.measure("6 group"):
+                numeric_columns = [column for column in self._df.columns if column not in [
+                    "Country", "Year", "Region"]]
+                grouped = self._df.groupby(["Country", "Year"], observed=True)[numeric_columns]
+                chunk_sums = grouped.sum().astype("float64")
+                chunk_counts = grouped.count()
+
+                # Kategorien unterscheiden sich von Block zu Block, daher wird der Index auf Text umgestellt;
+                # Zeilen ohne Jahr hat groupby verworfen, das Jahr ist daher wieder int64
+                index = pd.MultiIndex.from_arrays([
+                    chunk_sums.index.get_level_values("Country").astype(str),
+                    chunk_sums.index.get_level_values("Year").astype("int64")
+                ])
+                chunk_sums.index = index
+                chunk_counts.index = index
+
+                sums = chunk_sums if sums is None else pd.concat([sums, chunk_sums]).groupby(level=[0, 1]).sum()
+                counts = chunk_counts if counts is None else pd.concat(
+                    [counts, chunk_counts]).groupby(level=[0, 1]).sum()
+
+        # 6. Mittelwert aus Summe und Anzahl (ohne vorhandenen Wert bleibt die Gruppe leer)
+        with self.measure("6 group"):
+            self._df = (sums / counts.where(counts > 0)).rename_axis(["Country", "Year"]).reset_index()
+            self.order_columns()
+
+        # 7.-9.
+        self.complete({str(country): region for country, region in region_dict.items()})
+
+    def calc_row_values(self) -> None:
+        """
+            Berechnet die zeilenweisen Werte (Schritte 1-4 der Transformation):
+            Nettoeinkommen, Summe der Prozentwerte, Dollar-Werte und Summe aller Kosten.
+        """
+
         # 1.
-        self.calc_net_income()
+        with self.measure("1 net_income"):
+            self.calc_net_income()
 
         # 2.
-        self.add_sum("Sum_Percentage", [column for column in self._df.columns if column.endswith(
-            "Percentage") and column != "Savings_Percentage"])
+        with self.measure("2 sum_percentage"):
+            self.add_sum("Sum_Percentage", [column for column in self._df.columns if column.endswith(
+                "Percentage") and column != "Savings_Percentage"])
 
         # 3.
-        self.calc_real_values()
+        with self.measure("3 real_values"):
+            self.calc_real_values()
 
         # 4.
-        self.add_sum("Sum_Costs", [column for column in self._df.columns if column.endswith("Cost")])
+        with self.measure("4 sum_costs"):
+            self.add_sum("Sum_Costs", [column for column in self._df.columns if column.endswith("Cost")])
 
-        # 5.
-        region_dict = self._df.groupby("Country")["Region"].first().to_dict()
+    def complete(
+            self,
+            region_dict: Optional[dict]
+    ) -> None:
+        """
+            Schließt die Transformation nach der Gruppierung ab (Schritte 7-9 der Transformation):
+            Sortierung, Füllen fehlender Werte und Füllen der Regionen.
+
+        :param region_dict: Region je Land (None lässt Schritt 9 aus)
+        """
+
+        if self._workers and self._workers > 1:
+            with self.measure("7-9 complete_parallel"):
+                self.complete_parallel(region_dict)
+            return
 
-        # 6.
-        self._df = self._df.groupby(
-            ["Country", "Year"], as_index=False).mean(numeric_only=True)
         # 7.
-        self._df.sort_values(by=["Country", "Year"], inplace=True)
+        with self.measure("7 sort"):
+            self._df.sort_values(by=["Country", "Year"], inplace=True)
 
         # 8.
-        self.fill_missing_values()
+        with self.measure("8 fill_missing_values"):
+            self.fill_missing_values()
 
         # 9.
-        self._df["Region"] = self._df["Country"].map(region_dict)
+        if region_dict is not None:
+            with self.measure("9 assign_regions"):
+                self._df["Region"] = self._df["Country"].map(region_dict)
+
+    def complete_parallel(
+            self,
+            region_dict: Optional[dict]
+    ) -> None:
+        """
+            Führt die Schritte 7-9 parallel in einem Prozess-Pool aus. Die Schritte hängen nur von den Zeilen
+            eines Landes ab; die nach Land sortierten Daten werden daher in zusammenhängende Teile aus ganzen
+            Ländern zerlegt und die Ergebnisse in derselben Reihenfolge wieder zusammengefügt. Das Ergebnis ist
+            identisch mit dem der Berechnung in einem Prozess.
+
+        :param region_dict: Region je Land (None lässt Schritt 9 aus)
+        """
+
+        self._df = self._df.sort_values(by=["Country", "Year"]).reset_index(drop=True)
+        partitions = self.partition_by_country(self._workers * self._partitions_per_worker)
+
+        # Bei höchstens einem Teil lohnt sich kein Prozess-Pool
+        if len(partitions) < 2:
+            self._df = complete_partition(self._df, self._year_range, region_dict)
+            return
+
+        with ProcessPoolExecutor(max_workers=self._workers) as executor:
+            results = list(executor.map(
+                complete_partition,
+                partitions,
+                [self._year_range] * len(partitions),
+                [None if region_dict is None else
+                 {country: region_dict.get(country) for country in partition["Country"].unique()}
+                 for partition in partitions]
+            ))
+
+        self._df = pd.concat(results, ignore_index=True)
+
+    def partition_by_country(
+            self,
+            count: int
+    ) -> List[pd.DataFrame]:
+        """
+            Zerlegt die nach Land sortierten Daten in höchstens count zusammenhängende Teile aus ganzen Ländern
+            mit etwa gleich vielen Ländern.
+
+        :param count: Gewünschte Anzahl Teile
+        :return: Liste der Teile in der Reihenfolge der Länder
+        """
+
+        countries = self._df["Country"].to_numpy()
+        if not len(countries):
+            return []
+
+        # Erste Zeile jedes Landes
+        starts = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1]])
+        bounds = [starts[part[0]] for part in np.array_split(np.arange(len(starts)), count) if len(part)]
+
+        return [self._df.iloc[start:end] for start, end in zip(bounds, bounds[1:] + [len(countries)])]
 
     def fill_missing_values(self) -> None:
         """
             Füllt fehlende Werte im DataFrame auf mit linearer Interpolation.
+            Jedes Land erhält eine Zeile für jedes Jahr aus _year_range, Jahre außerhalb werden verworfen.
+            Alle Zahlenspalten werden in einem Durchlauf über ein Array der Form (Land, Jahr, Spalte) gefüllt.
         """
 
-        year_range = range(2000, 2024)
-
         # Alle Länder
         countries = self._df["Country"].unique()
 
-        # Combiation von allen Ländern und Jahren
-        all_combinations = pd.DataFrame(
-            [(country, year) for country in countries for year in year_range],
-            columns=["Country", "Year"]
-        )
+        # Kombination von allen Ländern und Jahren
+        all_combinations = pd.MultiIndex.from_product(
+            [countries, self._year_range], names=["Country", "Year"])
 
         # Einfügen der fehlenden Kombinationen
-        self._df = pd.merge(all_combinations, self._df, on=[
-                            "Country", "Year"], how="left")
+        self._df = self._df.set_index(["Country", "Year"]).reindex(all_combinations).reset_index()
 
         # Spalten mit zahlenwerten
         numeric_columns = [col for col in self._df.columns if col not in [
             "Country", "Year", "Region"]]
 
         # Füllen der fehlenden Werte
-        for column in numeric_columns:
-            self._df[column] = (
-                self._df.groupby("Country")[column]
-                # Füllen der fehlenden Werte mithilfe von linearer Interpolation
-                .apply(lambda group: group.interpolate(method="linear", limit_direction="both"))
-                .reset_index(level=0, drop=True)
-            )
+        values = self._df[numeric_columns].to_numpy(dtype="float64").reshape(
+            len(countries), len(self._year_range), len(numeric_columns))
+        filled = interpolate_linear(values).reshape(-1, len(numeric_columns))
+
+        self._df[numeric_columns] = pd.DataFrame(filled, columns=numeric_columns, index=self._df.index)
 
     def calc_net_income(self) -> None:
         """
-            Berechnet das Nettoeinkommen.
+            Berechnet das Nettoeinkommen. Die Spalte wird angehängt und erst nach der Gruppierung
+            (order_columns) neben Average_Monthly_Income verschoben.
         """
 
         self._df["Net_Income"] = self._df["Average_Monthly_Income"] * \
             0.01 * (100 - self._df["Tax_Rate"])
-        self.move_to_neighbour("Average_Monthly_Income", "Net_Income")
 
     def calc_real_values(self) -> None:
         """
-            Berechnet die dollar-Werte für alle Spalten im DataFrame die mit "_Percentage" enden
-            und fügt diese als Spalte ohne diesen suffix rechts daneben ein.
+            Berechnet die dollar-Werte für alle Spalten im DataFrame die "_Percentage" enthalten
+            (Prozentwert mal Nettoeinkommen) und hängt sie als Spalten ohne diesen suffix an.
+            Die bestehenden Spalten werden dabei nicht verschoben, die Reihenfolge stellt order_columns her.
         """
 
         suffix = "_Percentage"
-        for column in self._df.columns:
-            if suffix in column:
-                self._df[column.removesuffix(
-                    suffix)] = self._df[column] * 0.01 * self._df["Net_Income"]
-                self.move_to_neighbour(column, column.removesuffix(suffix))
-# Mavin-Moris Scholl
-    def move_to_neighbour(
-            self,
-            column,
-            new_neighbour
-    ) -> None:
-        """
-            Verschiebt eine Spalte im DataFrame.
+        percentage_columns = [column for column in self._df.columns if suffix in column]
+        real_columns = [column.removesuffix(suffix) for column in percentage_columns]
+
+        # Jede Spalte wird in-place aus einer Kopie der Prozentwerte berechnet und hinten angehängt (bereits
+        # vorhandene Spalten gleichen Namens werden ersetzt). Neben dem Ergebnis wird so nur eine Spalte
+        # zusätzlich belegt, eine Matrix aller Spalten wäre beim Einfügen doppelt im Speicher.
+        net_income = self._df["Net_Income"].to_numpy(dtype="float64")
+        for column, real_column in zip(percentage_columns, real_columns):
+            values = self._df[column].to_numpy(dtype="float64", copy=True)
+            values *= 0.01
+            values *= net_income
+            self._df[real_column] = values
 
-        :param column: Spalte woneben die neue Spalte eingefügt werden soll
-        :param new_neighbour: Spalte die verschoben werden soll
+    def order_columns(self) -> None:
+        """
+            Stellt die Spaltenreihenfolge einmalig her: Net_Income steht rechts neben Average_Monthly_Income
+            und jeder dollar-Wert rechts neben seiner Spalte mit "_Percentage". Wird nach der Gruppierung
+            aufgerufen, sodass nur noch eine Zeile je Land und Jahr umsortiert wird.
         """
 
-        neighbour_index = self._df.columns.get_loc(column)+1
-        self._df.insert(neighbour_index, new_neighbour,
-                        self._df.pop(new_neighbour))
+        suffix = "_Percentage"
+        neighbours = {"Average_Monthly_Income": "Net_Income"} if "Net_Income" in self._df.columns else {}
+        neighbours.update({
+            column: column.removesuffix(suffix) for column in self._df.columns
+            if suffix in column and column.removesuffix(suffix) in self._df.columns
+        })
+        moved = set(neighbours.values())
+
+        order = []
+        for column in self._df.columns:
+            if column in moved:
+                continue
+            order.append(column)
+            if column in neighbours:
+                order.append(neighbours[column])
+
+        self._df = self._df[order]
 
     def add_sum(
             self,
             column_name: str,
-            columns: list
+            columns: list,
+            chunk_size: int = 65_536
     ) -> None:
         """
             Berechnet die Summe der Werte in den Spalten und fügt sie als neue Spalte hinzu.
+            Bei float64-Spalten wird die Matrix blockweise zeilenweise zusammenhängend aufgebaut und summiert,
+            das liefert dieselben Werte wie DataFrame.sum, ohne die Spalten auf einmal zu kopieren.
 
         :param column_name: Name der neuen Spalte
         :param columns: Liste der Spalten, deren Werte summiert werden sollen
+        :param chunk_size: Anzahl Zeilen, die auf einmal summiert werden
         """
 
-        self._df[column_name] = self._df[columns].sum(axis=1)
+        if not columns or any(self._df[column].dtype != np.float64 for column in columns):
+            self._df[column_name] = self._df[columns].sum(axis=1)
+            return
+
+        arrays = [self._df[column].to_numpy() for column in columns]
+        sums = np.empty(len(self._df))
+        values = np.empty((min(chunk_size, len(self._df)), len(columns)))
+
+        for start in range(0, len(self._df), chunk_size):
+            chunk = values[:min(chunk_size, len(self._df) - start)]
+            for position, array in enumerate(arrays):
+                chunk[:, position] = array[start:start + len(chunk)]
+            # Wie bei DataFrame.sum zählen fehlende Werte als 0
+            chunk[np.isnan(chunk)] = 0.0
+            chunk.sum(axis=1, out=sums[start:start + len(chunk)])
+
+        self._df[column_name] = sums
 
 # Mavin-Moris Scholl
 # load ---------------------------------------------------------------------------------------------------------
@@ -180,19 +628,184 @@ class ETL_Handler:
     def save_to_db(
             self,
             db_name: str,
+            table_name: str,
+            journal: bool = True
+    ) -> float:
+        """
+            Speichert die Daten in einer SQLite-Datenbank. Die Tabelle wird mit expliziten Spaltentypen angelegt,
+            alle Zeilen werden in einer einzigen Transaktion geschrieben und die Indizes erst danach erstellt.
+            Mit journal=False schreibt SQLite ohne Rollback-Journal und ohne fsync. Das ist nur für neu gebaute
+            Dateien zulässig, die erst danach veröffentlicht werden: nach einem Absturz ist die Datei unbrauchbar
+            und wird verworfen, die veröffentlichte Version bleibt unberührt.
+
+        :param db_name: Name der SQLite-Datenbank
+        :param table_name: Name der Tabelle in der SQLite-Datenbank
+        :param journal: Mit Rollback-Journal und fsync schreiben (False nur für neu gebaute Dateien)
+        :return: Geschriebene Zeilen pro Sekunde
+        """
+
+        with self.measure("save_to_db"), closing(sqlite3.connect(db_name)) as connection:
+            if not journal:
+                connection.execute("PRAGMA journal_mode = OFF")
+                connection.execute("PRAGMA synchronous = OFF")
+
+            with connection:
+                self.create_table(connection, table_name)
+
+                started = time.perf_counter()
+                self.insert_rows(connection, table_name)
+                self.rows_per_second = len(self._df) / max(time.perf_counter() - started, 1e-9)
+
+                self.create_indexes(connection, table_name)
+                self.write_run_id(connection, table_name)
+                self.save_region_aggregates(connection, table_name)
+
+        return self.rows_per_second
+
+    def insert_rows(
+            self,
+            connection: sqlite3.Connection,
+            table_name: str,
+            chunk_size: int = 100_000
+    ) -> None:
+        """
+            Schreibt alle Zeilen per executemany in die Tabelle. Die Werte werden blockweise spaltenweise in
+            Python-Typen umgewandelt (int, float, str) und als Tupel übergeben, ohne alle Zeilen auf einmal
+            im Speicher zu halten. NaN speichert SQLite als NULL.
+
+        :param connection: Offene Verbindung zur SQLite-Datenbank (Transaktion des Aufrufers)
+        :param table_name: Name der Tabelle in der SQLite-Datenbank
+        :param chunk_size: Anzahl Zeilen, die auf einmal umgewandelt werden
+        """
+
+        columns = [f'"{column}"' for column in self._df.columns]
+        statement = (f'INSERT INTO "{table_name}" ({", ".join(columns)}) '
+                     f'VALUES ({", ".join("?" for _ in columns)})')
+
+        for start in range(0, len(self._df), chunk_size):
+            chunk = self._df.iloc[start:start + chunk_size]
+            connection.executemany(statement, zip(*[chunk[column].tolist() for column in chunk.columns]))
+
+    def create_table(
+            self,
+            connection: sqlite3.Connection,
             table_name: str
     ) -> None:
         """
-            Speichert die Daten in einer SQLite-Datenbank.
+            Legt die Tabelle neu an, mit expliziten Spaltentypen und (Country, Year) als Primärschlüssel.
 
-        :param db_name: Name der SQLite-Datenbank
+        :param connection: Offene Verbindung zur SQLite-Datenbank
         :param table_name: Name der Tabelle in der SQLite-Datenbank
         """
 
-        with sqlite3.connect(db_name) as connection:
-            self._df.to_sql(
-                table_name, connection, if_exists='replace', index=False)
-            connection.commit()
+        columns = []
+        for column, dtype in self._df.dtypes.items():
+            if pd.api.types.is_integer_dtype(dtype):
+                sql_type = "INTEGER"
+            elif pd.api.types.is_numeric_dtype(dtype):
+                sql_type = "REAL"
+            else:
+                sql_type = "TEXT"
+            columns.append(f'"{column}" {sql_type}')
+
+        connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        connection.execute(
+            f'CREATE TABLE "{table_name}" ({", ".join(columns)}, '
+            f'PRIMARY KEY ({", ".join(PRIMARY_KEY)}))')
+
+    def create_indexes(
+            self,
+            connection: sqlite3.Connection,
+            table_name: str
+    ) -> None:
+        """
+            Erstellt die Indizes für die Abfragen des Backends.
+
+        :param connection: Offene Verbindung zur SQLite-Datenbank
+        :param table_name: Name der Tabelle in der SQLite-Datenbank
+        """
+
+        for name, columns in TABLE_INDEXES.items():
+            connection.execute(
+                f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_{name}" '
+                f'ON "{table_name}" ({", ".join(columns)})')
+
+    def write_run_id(
+            self,
+            connection: sqlite3.Connection,
+            table_name: str,
+            row_count: Optional[int] = None
+    ) -> None:
+        """
+            Vergibt eine neue Run-ID für diesen ETL-Lauf und speichert sie in der Tabelle ETL_Run.
+            Das Backend erkennt an der Run-ID, dass neue Daten vorliegen.
+
+        :param connection: Offene Verbindung zur SQLite-Datenbank
+        :param table_name: Name der geschriebenen Tabelle
+        :param row_count: Anzahl der Zeilen der Tabelle (Standard: Zeilen dieses Handlers)
+        """
+
+        self.run_id = uuid.uuid4().hex
+
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS ETL_Run "
+            "(Run_ID TEXT PRIMARY KEY, Created_At TEXT, Table_Name TEXT, Row_Count INTEGER)")
+        connection.execute(
+            "INSERT INTO ETL_Run VALUES (?, ?, ?, ?)",
+            (self.run_id, datetime.now(timezone.utc).isoformat(), table_name,
+             len(self._df) if row_count is None else row_count))
+
+    def save_region_aggregates(
+            self,
+            connection: sqlite3.Connection,
+            table_name: str
+    ) -> None:
+        """
+            Berechnet die Mittelwerte je Region und Jahr einmalig und speichert sie mit der Run-ID als
+            Versionsstempel in der Tabelle RegionYearAggregate. Die Berechnung erfolgt mit AVG() in SQLite,
+            damit die Werte genau denen der Live-Abfrage im Backend entsprechen.
+
+        :param connection: Offene Verbindung zur SQLite-Datenbank
+        :param table_name: Name der Tabelle mit den Länderdaten
+        """
+
+        connection.execute("DROP TABLE IF EXISTS RegionYearAggregate")
+        connection.execute(
+            "CREATE TABLE RegionYearAggregate (Region TEXT, Year INTEGER, "
+            + "".join(f"{column} REAL, " for column in REGION_AGGREGATE_COLUMNS)
+            + "Run_ID TEXT, PRIMARY KEY (Region, Year))")
+        connection.execute(
+            "INSERT INTO RegionYearAggregate SELECT Region, Year, "
+            + "".join(f"AVG({column}), " for column in REGION_AGGREGATE_COLUMNS)
+            + f'? FROM "{table_name}" GROUP BY Region, Year',
+            (self.run_id,))
+
+    def upsert_to_db(
+            self,
+            connection: sqlite3.Connection,
+            table_name: str,
+            removed_countries: list
+    ) -> None:
+        """
+            Schreibt die Zeilen dieses Handlers mit INSERT ... ON CONFLICT in die bestehende Tabelle und
+            löscht Länder, die nicht mehr in der Eingabe vorkommen. Läuft in der Transaktion des Aufrufers.
+
+        :param connection: Offene Verbindung zur SQLite-Datenbank
+        :param table_name: Name der Tabelle in der SQLite-Datenbank
+        :param removed_countries: Länder, deren Zeilen gelöscht werden
+        """
+
+        columns = [f'"{column}"' for column in self._df.columns]
+        updates = [f"{column} = excluded.{column}" for column in columns if column.strip('"') not in PRIMARY_KEY]
+
+        connection.executemany(
+            f'INSERT INTO "{table_name}" ({", ".join(columns)}) '
+            f'VALUES ({", ".join("?" for _ in columns)}) '
+            f'ON CONFLICT ({", ".join(PRIMARY_KEY)}) DO UPDATE SET {", ".join(updates)}',
+            self._df.to_numpy(dtype=object).tolist())
+
+        connection.executemany(
+            f'DELETE FROM "{table_name}" WHERE Country = ?', [(country,) for country in removed_countries])
 
 # ---------------------------------------------------------------------------------------------------------
 
@@ -217,10 +830,422 @@ class DB_Handler:
 
         print(tabulate(_df, headers='keys', tablefmt='psql'))
 
+# Mavin-Moris Scholl
+# incremental ---------------------------------------------------------------------------------------------------------
+
+def write_manifest(
+        connection: sqlite3.Connection,
+        table_name: str,
+        hashes: pd.Series,
+        source_hash: str,
+        settings: str,
+        countries: Optional[list] = None
+) -> None:
+    """
+        Speichert die Fingerabdrücke je (Country, Year) und den Hash der Quelldatei.
+
+    :param connection: Offene Verbindung zur SQLite-Datenbank
+    :param table_name: Name der Tabelle mit den Länderdaten
+    :param hashes: Fingerabdrücke mit (Country, Year) als Index
+    :param source_hash: Hash der Quelldatei
+    :param settings: Einstellungen des Laufs, bei deren Änderung neu aufgebaut werden muss
+    :param countries: Nur die Einträge dieser Länder ersetzen (None ersetzt alle)
+    """
+
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} "
+        "(Table_Name TEXT, Country TEXT, Year INTEGER, Row_Hash INTEGER, PRIMARY KEY (Table_Name, Country, Year))")
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {SOURCE_TABLE} "
+        "(Table_Name TEXT PRIMARY KEY, File_Hash TEXT, Settings TEXT)")
+
+    if countries is None:
+        connection.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE Table_Name = ?", (table_name,))
+    else:
+        connection.executemany(
+            f"DELETE FROM {MANIFEST_TABLE} WHERE Table_Name = ? AND Country = ?",
+            [(table_name, country) for country in countries])
+        hashes = hashes[hashes.index.get_level_values("Country").isin(countries)]
+
+    connection.executemany(
+        f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?)",
+        [(table_name, country, int(year), int(row_hash)) for (country, year), row_hash in hashes.items()])
+    connection.execute(
+        f"INSERT OR REPLACE INTO {SOURCE_TABLE} VALUES (?, ?, ?)", (table_name, source_hash, settings))
+
+
+def read_manifest(
+        connection: sqlite3.Connection,
+        table_name: str
+) -> tuple:
+    """
+        Liest den Hash der Quelldatei, die Einstellungen und die Fingerabdrücke des letzten Laufs.
+
+    :param connection: Offene Verbindung zur SQLite-Datenbank
+    :param table_name: Name der Tabelle mit den Länderdaten
+    :return: (Hash der Quelldatei, Einstellungen, Fingerabdrücke), oder (None, None, None) ohne Manifest
+    """
+
+    try:
+        source = connection.execute(
+            f"SELECT File_Hash, Settings FROM {SOURCE_TABLE} WHERE Table_Name = ?", (table_name,)).fetchone()
+        rows = connection.execute(
+            f"SELECT Country, Year, Row_Hash FROM {MANIFEST_TABLE} WHERE Table_Name = ?", (table_name,)).fetchall()
+        columns = connection.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    except sqlite3.Error:
+        return None, None, None
+
+    if source is None or not columns:
+        return None, None, None
+
+    hashes = pd.Series(
+        [row[2] for row in rows],
+        index=pd.MultiIndex.from_tuples([row[:2] for row in rows], names=["Country", "Year"]),
+        dtype="int64")
+
+    return source[0], source[1], hashes
+
+
+def source_unchanged(
+        csv_path: str,
+        db_name: str,
+        table_name: str,
+        start_year: int = 2000,
+        end_year: int = 2023
+) -> bool:
+    """
+        Prüft anhand des Manifests, ob die Tabelle bereits aus genau dieser Quelldatei erstellt wurde.
+
+    :param csv_path: Pfad zur CSV-Datei
+    :param db_name: Name der SQLite-Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
+    :param start_year: Erstes Jahr der Tabelle
+    :param end_year: Letztes Jahr der Tabelle (einschließlich)
+    :return: True, wenn Quelldatei und Einstellungen unverändert sind
+    """
+
+    with closing(sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)) as connection:
+        stored_hash, stored_settings, _ = read_manifest(connection, table_name)
+
+    return (stored_hash, stored_settings) == (file_hash(csv_path), f"{start_year}-{end_year}")
+
+
+def run_incremental(
+        csv_path: str,
+        db_name: str,
+        table_name: str,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        workers: Optional[int] = None,
+        journal: bool = True,
+        metrics: Optional[RunMetrics] = None
+) -> str:
+    """
+        Aktualisiert die Tabelle inkrementell. Ist die Quelldatei unverändert, endet der Lauf nach dem Vergleich
+        ihres Hashes. Sonst werden die Fingerabdrücke je (Country, Year) mit dem Manifest verglichen und nur die
+        betroffenen Länder vollständig neu berechnet (die Interpolation benötigt alle Jahre eines Landes).
+        Die Ergebnisse werden in einer einzigen Transaktion per INSERT ... ON CONFLICT geschrieben.
+        Ohne Manifest oder bei geänderten Einstellungen wird die Tabelle vollständig neu aufgebaut.
+
+    :param csv_path: Pfad zur CSV-Datei
+    :param db_name: Name der SQLite-Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
+    :param start_year: Erstes Jahr der Tabelle
+    :param end_year: Letztes Jahr der Tabelle (einschließlich)
+    :param workers: Anzahl Prozesse für die Schritte 7-9 (siehe ETL_Handler)
+    :param journal: Beim vollständigen Neuaufbau mit Journal schreiben (siehe ETL_Handler.save_to_db)
+    :param metrics: Kennzahlen je Stufe erfassen
+    :return: Kurze Beschreibung, was geändert wurde
+    """
+
+    source_hash = file_hash(csv_path)
+    settings = f"{start_year}-{end_year}"
+
+    with closing(sqlite3.connect(db_name)) as connection:
+        stored_hash, stored_settings, stored_hashes = read_manifest(connection, table_name)
+
+    if (stored_hash, stored_settings) == (source_hash, settings):
+        return "unchanged"
+
+    raw = None
+    with measure(metrics, "extract", lambda: raw):
+        raw = pd.read_csv(csv_path, sep=",", encoding="utf-8-sig")
+        raw.columns = raw.columns.str.strip()
+
+    with measure(metrics, "row_hashes", lambda: raw):
+        hashes = row_hashes(raw)
+
+    # Ohne Manifest oder mit geänderten Einstellungen wird alles neu aufgebaut
+    rebuild = stored_hash is None or stored_settings != settings
+
+    if not rebuild:
+        # Länder mit neuen, geänderten oder entfernten (Country, Year)-Gruppen
+        compared = pd.concat(
+            [hashes.astype("Int64").rename("New"), stored_hashes.astype("Int64").rename("Old")], axis=1)
+        changed = compared[(compared["New"] != compared["Old"]).fillna(True)]
+        affected = sorted(set(changed.index.get_level_values("Country")))
+        removed = sorted(set(stored_hashes.index.get_level_values("Country")) - set(raw["Country"]))
+        recomputed = [country for country in affected if country not in removed]
+
+        processor = ETL_Handler.from_dataframe(
+            raw[raw["Country"].isin(recomputed)], start_year, end_year, workers, metrics)
+
+        # Geänderte Spalten erfordern ebenfalls einen vollständigen Neuaufbau
+        with closing(sqlite3.connect(db_name)) as connection:
+            table_columns = [row[1] for row in connection.execute(f'PRAGMA table_info("{table_name}")')]
+        rebuild = bool(recomputed) and list(processor._df.columns) != table_columns
+
+    if rebuild:
+        processor = ETL_Handler.from_dataframe(raw, start_year, end_year, workers, metrics)
+        rows_per_second = processor.save_to_db(db_name, table_name, journal)
+        with closing(sqlite3.connect(db_name)) as connection, connection:
+            write_manifest(connection, table_name, hashes, source_hash, settings)
+
+        return f"full rebuild ({len(processor._df)} rows, {rows_per_second:.0f} rows/s)"
+
+    with closing(sqlite3.connect(db_name, isolation_level=None)) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if affected:
+                with processor.measure("upsert_to_db"):
+                    processor.upsert_to_db(connection, table_name, removed)
+                row_count = connection.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+                processor.write_run_id(connection, table_name, row_count)
+                processor.save_region_aggregates(connection, table_name)
+
+            write_manifest(connection, table_name, hashes, source_hash, settings, affected)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    return f"{len(recomputed)} countries recomputed, {len(removed)} removed"
+
+# Davide Pedergnana
+# publish ---------------------------------------------------------------------------------------------------------
+
+def marker_path(
+        db_path: str
+) -> str:
+    """
+        Pfad der Markierungsdatei mit dem Dateinamen der veröffentlichten Datenbankversion.
+        Muss zu marker_path in src/backend/dataset.py passen, über die das Backend die aktive Datei findet.
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :return: Pfad der Markierungsdatei
+    """
+
+    return os.path.splitext(db_path)[0] + ".current"
+
+
+def published_path(
+        db_path: str
+) -> Optional[str]:
+    """
+        Ermittelt die aktuell veröffentlichte Datenbankversion.
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :return: Pfad der veröffentlichten Datei, oder None wenn es keine gibt
+    """
+
+    try:
+        with open(marker_path(db_path), "r", encoding="utf-8") as file:
+            path = os.path.join(os.path.dirname(db_path), file.read().strip())
+    except OSError:
+        return None
+
+    return path if os.path.isfile(path) else None
+
+
+def build_path(
+        db_path: str
+) -> str:
+    """
+        Erstellt einen neuen, eindeutigen Pfad für eine Datenbankversion neben der konfigurierten Datei,
+        z.B. CostOfLivingAndIncome.20250101T120000-1a2b3c4d.db. Die Namen sind nach Erstellzeit sortierbar.
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :return: Pfad der neuen Version
+    """
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+
+    return f"{os.path.splitext(db_path)[0]}.{stamp}-{uuid.uuid4().hex[:8]}.db"
+
+
+def verify_database(
+        db_path: str,
+        table_name: str
+) -> None:
+    """
+        Prüft eine gebaute Datenbankversion vor der Veröffentlichung: Integrität der Datei, Anzahl der Zeilen
+        gegenüber dem letzten Eintrag in ETL_Run und vorhandene Mittelwerte je Region für diesen Lauf.
+
+    :param db_path: Pfad der gebauten Datenbank
+    :param table_name: Name der Tabelle mit den Länderdaten
+    :raises ValueError: Wenn eine der Prüfungen fehlschlägt
+    """
+
+    with closing(sqlite3.connect(db_path)) as connection:
+        integrity = connection.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            raise ValueError(f"{db_path}: integrity check failed ({integrity})")
+
+        run = connection.execute(
+            "SELECT Run_ID, Row_Count FROM ETL_Run WHERE Table_Name = ? ORDER BY rowid DESC LIMIT 1",
+            (table_name,)).fetchone()
+        if run is None:
+            raise ValueError(f"{db_path}: no ETL run recorded for {table_name}")
+
+        row_count = connection.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+        if row_count == 0 or row_count != run[1]:
+            raise ValueError(f"{db_path}: {table_name} has {row_count} rows, expected {run[1]}")
+
+        aggregates = connection.execute(
+            "SELECT COUNT(*) FROM RegionYearAggregate WHERE Run_ID = ?", (run[0],)).fetchone()[0]
+        if aggregates == 0:
+            raise ValueError(f"{db_path}: RegionYearAggregate is missing for run {run[0]}")
+
+
+def publish_database(
+        new_path: str,
+        db_path: str,
+        keep_versions: int = 3
+) -> None:
+    """
+        Veröffentlicht eine geprüfte Datenbankversion, indem die Markierungsdatei atomar (os.replace) auf die
+        neue Datei umgestellt wird. Leser sehen also entweder die alte oder die neue, nie eine halb geschriebene
+        Datei. Ältere Versionen bleiben bis auf die letzten keep_versions erhalten, damit laufende Anfragen
+        des Backends auf der alten Datei noch beendet werden können.
+
+    :param new_path: Pfad der neuen Version
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :param keep_versions: Anzahl der Versionen, die behalten werden (einschließlich der neuen)
+    """
+
+    marker = marker_path(db_path)
+    temporary = f"{marker}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(os.path.basename(new_path))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, marker)
+
+    versions = sorted(glob.glob(f"{glob.escape(os.path.splitext(db_path)[0])}.*-*.db"))
+    for path in versions[:-max(keep_versions, 1)]:
+        if path != new_path:
+            try:
+                os.remove(path)
+            except OSError:
+                # Unter Windows kann eine noch geöffnete Datei nicht gelöscht werden, dann beim nächsten Mal
+                pass
+
+
+def build_and_publish(
+        db_path: str,
+        table_name: str,
+        build: Callable[[str], str],
+        keep_versions: int = 3,
+        metrics: Optional[RunMetrics] = None
+) -> str:
+    """
+        Baut eine neue Datenbankversion in einer eigenen Datei, prüft sie und veröffentlicht sie.
+        Schlägt einer der Schritte fehl, wird die neue Datei gelöscht und die veröffentlichte Version bleibt aktiv.
+
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
+    :param build: Funktion, die die Datenbank unter dem übergebenen Pfad baut und eine Beschreibung zurückgibt
+    :param keep_versions: Anzahl der Versionen, die behalten werden
+    :param metrics: Kennzahlen je Stufe erfassen
+    :return: Kurze Beschreibung, was veröffentlicht wurde
+    """
+
+    new_path = build_path(db_path)
+    try:
+        status = build(new_path)
+        with measure(metrics, "verify_database"):
+            verify_database(new_path, table_name)
+    except BaseException:
+        if os.path.exists(new_path):
+            os.remove(new_path)
+        raise
+
+    publish_database(new_path, db_path, keep_versions)
+
+    return f"{status}, published {os.path.basename(new_path)}"
+
+
+def run_publish(
+        csv_path: str,
+        db_path: str,
+        table_name: str,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        chunk_size: Optional[int] = None,
+        float32: bool = False,
+        incremental: bool = False,
+        keep_versions: int = 3,
+        workers: Optional[int] = None,
+        metrics: Optional[RunMetrics] = None
+) -> str:
+    """
+        Baut eine neue Datenbankversion in einer eigenen Datei, prüft sie und veröffentlicht sie
+        (Blue/Green). Die Datei, aus der das Backend gerade liest, wird dabei nie verändert.
+        Im inkrementellen Modus wird die veröffentlichte Version kopiert und die Kopie aktualisiert;
+        ist die Quelldatei unverändert, wird nichts veröffentlicht.
+
+    :param csv_path: Pfad zur CSV-Datei
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
+    :param start_year: Erstes Jahr der Tabelle
+    :param end_year: Letztes Jahr der Tabelle (einschließlich)
+    :param chunk_size: Datei blockweise verarbeiten (siehe ETL_Handler)
+    :param float32: Zahlenspalten beim blockweisen Einlesen als float32 lesen
+    :param incremental: Nur neue oder geänderte Länder neu berechnen (siehe run_incremental)
+    :param keep_versions: Anzahl der Versionen, die behalten werden
+    :param workers: Anzahl Prozesse für die Schritte 7-9 (siehe ETL_Handler)
+    :param metrics: Kennzahlen je Stufe erfassen
+    :return: Kurze Beschreibung, was veröffentlicht wurde
+    """
+
+    current = published_path(db_path)
+    if incremental and current is not None and source_unchanged(
+            csv_path, current, table_name, start_year, end_year):
+        return "unchanged"
+
+    def build(new_path: str) -> str:
+        if incremental and current is not None:
+            with closing(sqlite3.connect(current)) as source, closing(sqlite3.connect(new_path)) as target:
+                source.backup(target)
+
+        if incremental or not chunk_size:
+            # In einer leeren Datei baut run_incremental alles neu auf und legt dabei das Manifest an,
+            # sodass spätere inkrementelle Läufe darauf aufsetzen können
+            # Die neue Datei ist bis zur Veröffentlichung unsichtbar und braucht daher kein Journal
+            return run_incremental(csv_path, new_path, table_name, start_year, end_year, workers, False, metrics)
+
+        processor = ETL_Handler(csv_path, start_year, end_year, chunk_size, float32, workers, metrics=metrics)
+        rows_per_second = processor.save_to_db(new_path, table_name, journal=False)
+        return f"full build ({len(processor._df)} rows, {rows_per_second:.0f} rows/s)"
+
+    return build_and_publish(db_path, table_name, build, keep_versions, metrics)
+
 # Main ---------------------------------------------------------------------------------------------------------
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lädt die CSV-Datei in die SQLite-Datenbank.")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="nur neue oder geänderte Länder neu berechnen und per Upsert schreiben")
+    parser.add_argument(
+        "--profile", metavar="DIR",
+        help="für jede Stufe eine cProfile-Datei in DIR schreiben (auswertbar z.B. mit snakeviz oder pstats)")
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Spitzenwert der Speicherallokationen je Stufe mit tracemalloc messen (verlangsamt den Lauf)")
+    ARGS = parser.parse_args()
+
     # Initialisiert die Verarbeitungsklasse mit dem Pfad zur CSV-Datei.
     ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     CONFIG_FILE = os.path.join(ROOT, "ETL/ETL_Config.yaml")
@@ -228,12 +1253,55 @@ if __name__ == "__main__":
     with open(CONFIG_FILE, "r") as file:
         CONFIG: dict = dict(yaml.safe_load(file))
 
-    processor = ETL_Handler(
-        os.path.join(ROOT, CONFIG["CSV_PATH"]))
+    # Kennzahlen je Stufe (Laufzeit, CPU-Zeit, Speicher, Zeilen und Spalten) für den Bericht des Laufs
+    METRICS = RunMetrics(ARGS.profile, ARGS.trace_memory)
+
+    if CONFIG.get("PUBLISH", True):
+        # Baut eine neue Datenbankversion und veröffentlicht sie, ohne die aktive Datei zu verändern.
+        STATUS = run_publish(
+            os.path.join(ROOT, CONFIG["CSV_PATH"]),
+            os.path.join(ROOT, CONFIG["DB_NAME"]),
+            CONFIG["TABLE_NAME"],
+            CONFIG.get("START_YEAR", 2000),
+            CONFIG.get("END_YEAR", 2023),
+            CONFIG.get("CHUNK_SIZE"),
+            CONFIG.get("FLOAT32", False),
+            ARGS.incremental,
+            CONFIG.get("KEEP_VERSIONS", 3),
+            CONFIG.get("WORKERS"),
+            METRICS)
+
+    elif ARGS.incremental:
+        STATUS = run_incremental(
+            os.path.join(ROOT, CONFIG["CSV_PATH"]),
+            os.path.join(ROOT, CONFIG["DB_NAME"]),
+            CONFIG["TABLE_NAME"],
+            CONFIG.get("START_YEAR", 2000),
+            CONFIG.get("END_YEAR", 2023),
+            CONFIG.get("WORKERS"),
+            metrics=METRICS)
+
+    else:
+        processor = ETL_Handler(
+            os.path.join(ROOT, CONFIG["CSV_PATH"]),
+            CONFIG.get("START_YEAR", 2000),
+            CONFIG.get("END_YEAR", 2023),
+            CONFIG.get("CHUNK_SIZE"),
+            CONFIG.get("FLOAT32", False),
+            CONFIG.get("WORKERS"),
+            metrics=METRICS)
+
+        # Speichert die Daten direkt in der SQLite-Datenbank.
+        ROWS_PER_SECOND = processor.save_to_db(os.path.join(
+            ROOT, CONFIG["DB_NAME"]), CONFIG["TABLE_NAME"])
+        STATUS = f"{len(processor._df)} rows, {ROWS_PER_SECOND:.0f} rows/s"
+
+    print(STATUS)
 
-    # Speichert die Daten in der SQLite-Datenbank.
-    processor.save_to_db(os.path.join(
-        ROOT, CONFIG["DB_NAME"]), CONFIG["TABLE_NAME"])
+    if CONFIG.get("REPORT_DIR"):
+        print(METRICS.table())
+        print("report:", METRICS.write(os.path.join(ROOT, CONFIG["REPORT_DIR"]), {
+            "csv_path": CONFIG["CSV_PATH"], "status": STATUS, "config": CONFIG}))
 
     # DB_Handler.show_db(os.path.join(
     #    ROOT, CONFIG["DB_NAME"]), CONFIG["TABLE_NAME"])
@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+from tabulate import tabulate
+
+from ETL import ETL_Handler
+from generate_data import countries_for_rows, write_csv
+from metrics import RunMetrics
+
+# Standardgrößen der Datensätze in Zeilen. 10^7 nur auf Anfrage (--sizes), da ein Lauf damit etwa zehnmal so
+# lange dauert wie mit 10^6 (rund 2-3 Minuten je Wiederholung) und mehrere GB Arbeitsspeicher braucht
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Einstellungen, die das Ergebnis bestimmen und zwischen Baseline und Lauf übereinstimmen müssen
+COMPARED_SETTINGS = ["start_year", "end_year", "duplicate_rate", "missing_rate", "seed", "workers"]
+
+
+def dataset_path(
+        data_dir: str,
+        rows: int,
+        settings: dict
+) -> str:
+    """
+        Pfad der synthetischen CSV-Datei für eine Größe. Die Datei wird beim ersten Aufruf erzeugt und danach
+        wiederverwendet, ihr Name enthält alle Einstellungen des Generators.
+
+    :param data_dir: Verzeichnis der Datensätze
+    :param rows: Ungefähre Anzahl Zeilen
+    :param settings: Einstellungen des Laufs (siehe COMPARED_SETTINGS)
+    :return: Pfad der CSV-Datei
+    """
+
+    path = os.path.join(data_dir, "rows{}_{}-{}_dup{}_miss{}_seed{}.csv".format(
+        rows, settings["start_year"], settings["end_year"], settings["duplicate_rate"], settings["missing_rate"],
+        settings["seed"]))
+
+    if not os.path.exists(path):
+        countries = countries_for_rows(rows, settings["start_year"], settings["end_year"], settings["duplicate_rate"])
+        write_csv(path, countries, settings["start_year"], settings["end_year"], settings["duplicate_rate"],
+                  settings["missing_rate"], seed=settings["seed"])
+
+    return path
+
+
+def run_once(
+        csv_path: str,
+        settings: dict,
+        table_name: str
+) -> Dict[str, float]:
+    """
+        Führt das ETL einmal vollständig aus (Einlesen, Transformation, Speichern in eine temporäre Datenbank) und
+        liefert die Laufzeit jeder Stufe. "transform" fasst die nummerierten Schritte 1-9 zusammen.
+
+    :param csv_path: Pfad der CSV-Datei
+    :param settings: Einstellungen des Laufs
+    :param table_name: Name der Tabelle
+    :return: Laufzeit in Sekunden je Stufe
+    """
+
+    metrics = RunMetrics()
+
+    with tempfile.TemporaryDirectory() as directory:
+        processor = ETL_Handler(
+            csv_path, settings["start_year"], settings["end_year"], workers=settings["workers"], metrics=metrics)
+        # Wie beim Veröffentlichen wird eine neue Datei ohne Journal geschrieben
+        processor.save_to_db(os.path.join(directory, "benchmark.db"), table_name, journal=False)
+
+    seconds = {stage["name"]: stage["wall_seconds"] for stage in metrics.stages.values()}
+    seconds["transform"] = sum(value for name, value in seconds.items() if name[0].isdigit())
+    seconds["total"] = metrics.report()["wall_seconds"]
+
+    return seconds
+
+
+def run_benchmarks(
+        sizes: List[int],
+        repeat: int,
+        settings: dict,
+        data_dir: str,
+        table_name: str
+) -> Dict[str, dict]:
+    """
+        Misst jede Größe repeat-mal und fasst die Laufzeiten je Stufe zusammen (Minimum und Median).
+        Verglichen wird das Minimum, weil es am wenigsten von anderen Prozessen auf dem Rechner abhängt.
+
+    :param sizes: Größen der Datensätze in Zeilen
+    :param repeat: Anzahl Wiederholungen je Größe
+    :param settings: Einstellungen des Laufs
+    :param data_dir: Verzeichnis der Datensätze
+    :param table_name: Name der Tabelle
+    :return: Je Größe die Anzahl Zeilen der Datei und je Stufe Minimum und Median der Laufzeit
+    """
+
+    results = {}
+
+    for rows in sizes:
+        csv_path = dataset_path(data_dir, rows, settings)
+        runs = [run_once(csv_path, settings, table_name) for _ in range(repeat)]
+
+        with open(csv_path, "rb") as file:
+            csv_rows = sum(1 for _ in file) - 1
+
+        results[str(rows)] = {
+            "csv_rows": csv_rows,
+            "stages": {
+                name: {"min": min(run[name] for run in runs), "median": statistics.median(run[name] for run in runs)}
+                for name in runs[0]
+            },
+        }
+        print(f"{rows} rows: {results[str(rows)]['stages']['total']['min']:.3f} s", file=sys.stderr)
+
+    return results
+
+
+def compare(
+        baseline: Dict[str, dict],
+        results: Dict[str, dict],
+        threshold: float,
+        min_seconds: float
+) -> Tuple[List[list], List[str]]:
+    """
+        Vergleicht die Laufzeiten mit der Baseline. Eine Stufe gilt als langsamer geworden, wenn ihr Minimum um
+        mehr als threshold Prozent über dem der Baseline liegt. Stufen, die in beiden Läufen schneller als
+        min_seconds sind, werden nicht bewertet (dort überwiegen Messschwankungen).
+
+    :param baseline: Ergebnisse der Baseline
+    :param results: Ergebnisse des aktuellen Laufs
+    :param threshold: Erlaubte Verlangsamung in Prozent
+    :param min_seconds: Mindestlaufzeit für die Bewertung
+    :return: Zeilen der Vergleichstabelle und Beschreibung der Verlangsamungen
+    """
+
+    rows, regressions = [], []
+
+    for size, result in results.items():
+        for name, current in result["stages"].items():
+            before = baseline.get(size, {}).get("stages", {}).get(name)
+            if before is None:
+                rows.append([size, name, None, current["min"], None, "new"])
+                continue
+
+            change = (current["min"] - before["min"]) / max(before["min"], 1e-9) * 100
+            if max(current["min"], before["min"]) < min_seconds:
+                state = "below min-seconds"
+            elif change > threshold:
+                state = "REGRESSION"
+                regressions.append(f"{size} rows, {name}: {before['min']:.4f} s -> {current['min']:.4f} s "
+                                   f"({change:+.1f} %)")
+            else:
+                state = "ok"
+            rows.append([size, name, before["min"], current["min"], change, state])
+
+    return rows, regressions
+
+# Main ---------------------------------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Misst extract, transform, fill_missing_values und save_to_db mit synthetischen Datensätzen "
+                    "verschiedener Größe und vergleicht die Laufzeiten mit einer gespeicherten Baseline.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=SIZES,
+        help="Größen der Datensätze in Zeilen (Standard 1000 10000 100000 1000000, z.B. zusätzlich 10000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen je Größe (Standard 3)")
+    parser.add_argument(
+        "--duplicate-rate", type=float, default=0.05, help="Anteil doppelter Zeilen (Standard 0.05)")
+    parser.add_argument(
+        "--missing-rate", type=float, default=0.02, help="Anteil fehlender Zahlenwerte (Standard 0.02)")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert des Generators (Standard 0)")
+    parser.add_argument("--workers", type=int, help="Prozesse für die Schritte 7-9 (Standard wie WORKERS)")
+    parser.add_argument("--baseline", help="Datei der Baseline (Standard <BENCHMARK_DIR>/baseline.json)")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern statt zu vergleichen")
+    parser.add_argument(
+        "--threshold", type=float, default=20.0, help="erlaubte Verlangsamung in Prozent (Standard 20)")
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.05,
+        help="kürzere Stufen werden nicht bewertet (Standard 0.05)")
+    ARGS = parser.parse_args()
+
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    CONFIG_FILE = os.path.join(ROOT, "ETL/ETL_Config.yaml")
+
+    with open(CONFIG_FILE, "r") as file:
+        CONFIG: dict = dict(yaml.safe_load(file))
+
+    BENCHMARK_DIR = os.path.join(ROOT, CONFIG.get("BENCHMARK_DIR", "ETL/.benchmark"))
+    BASELINE_PATH = ARGS.baseline or os.path.join(BENCHMARK_DIR, "baseline.json")
+
+    SETTINGS = {
+        "start_year": CONFIG.get("START_YEAR", 2000),
+        "end_year": CONFIG.get("END_YEAR", 2023),
+        "duplicate_rate": ARGS.duplicate_rate,
+        "missing_rate": ARGS.missing_rate,
+        "seed": ARGS.seed,
+        "workers": ARGS.workers if ARGS.workers is not None else CONFIG.get("WORKERS"),
+    }
+
+    BASELINE: Optional[dict] = None
+    if not ARGS.save_baseline and os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as file:
+            BASELINE = json.load(file)
+
+        DIFFERENT = [key for key in COMPARED_SETTINGS if BASELINE["settings"].get(key) != SETTINGS[key]]
+        if DIFFERENT:
+            sys.exit(f"baseline {BASELINE_PATH} was measured with different settings: {', '.join(DIFFERENT)}")
+
+    RESULTS = run_benchmarks(
+        ARGS.sizes, ARGS.repeat, SETTINGS, os.path.join(BENCHMARK_DIR, "data"), CONFIG["TABLE_NAME"])
+
+    RUN = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "settings": SETTINGS,
+        "repeat": ARGS.repeat,
+        "results": RESULTS,
+    }
+
+    # Jeder Lauf wird zusätzlich mit Zeitstempel abgelegt, damit sich die Entwicklung verfolgen lässt
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    RUN_PATH = os.path.join(BENCHMARK_DIR, f"benchmark-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(RUN_PATH, "w", encoding="utf-8") as file:
+        json.dump(RUN, file, indent=2)
+
+    if ARGS.save_baseline or BASELINE is None:
+        os.makedirs(os.path.dirname(os.path.abspath(BASELINE_PATH)), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+            json.dump(RUN, file, indent=2)
+
+        print(tabulate(
+            [[size, name, stage["min"], stage["median"]]
+             for size, result in RESULTS.items() for name, stage in result["stages"].items()],
+            headers=["rows", "stage", "min_seconds", "median_seconds"], tablefmt="psql", floatfmt=".4f"))
+        print("baseline:", BASELINE_PATH)
+        sys.exit(0)
+
+    TABLE, REGRESSIONS = compare(BASELINE["results"], RESULTS, ARGS.threshold, ARGS.min_seconds)
+
+    print(tabulate(TABLE, headers=["rows", "stage", "baseline_seconds", "seconds", "change_%", "state"],
+                   tablefmt="psql", floatfmt=".4f"))
+    print("run:", RUN_PATH)
+
+    if REGRESSIONS:
+        print(f"{len(REGRESSIONS)} stages more than {ARGS.threshold:.0f} % slower than the baseline:")
+        for REGRESSION in REGRESSIONS:
+            print("  " + REGRESSION)
+        sys.exit(1)
@@ -0,0 +1,288 @@
+import argparse
+import math
+import os
+import uuid
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+# Spalten der CSV-Datei in der Reihenfolge von data/Expanded_Country_Economic_Data.csv
+COLUMNS = [
+    "Country", "Year", "Average_Monthly_Income", "Cost_of_Living", "Housing_Cost_Percentage", "Tax_Rate",
+    "Savings_Percentage", "Healthcare_Cost_Percentage", "Education_Cost_Percentage",
+    "Transportation_Cost_Percentage", "Region"
+]
+
+# Regionen mit ihrem Anteil an den Ländern der echten Daten
+REGIONS = {
+    "Africa": 3, "Asia": 5, "Europe": 6, "North America": 3, "Oceania": 2, "South America": 3,
+}
+
+# Einkommen: Logarithmus (Mittelwert, Standardabweichung) und jährliches Wachstum (Mittelwert, Streuung
+# zwischen den Ländern, Streuung von Jahr zu Jahr)
+LOG_INCOME = (7.63, 0.68)
+INCOME_GROWTH = (0.021, 0.015, 0.03)
+
+# Lebenshaltungskosten als Anteil am Einkommen (Mittelwert, Streuung zwischen den Ländern, von Jahr zu Jahr)
+COST_RATIO = (0.68, 0.044, 0.01)
+
+# Prozentwerte: Mittelwert, Standardabweichung, Gewicht des Einkommens und Gewicht eines gemeinsamen Faktors
+# der Ausgaben. Die Gewichte bilden die Korrelationen der echten Daten nach (z.B. Steuern steigen mit dem
+# Einkommen, Sparen sinkt mit hohen Ausgaben für Wohnen, Gesundheit und Verkehr).
+PERCENTAGES = {
+    "Housing_Cost_Percentage": (33.04, 2.87, 0.0, 0.6),
+    "Tax_Rate": (21.13, 6.37, 0.8, 0.0),
+    "Savings_Percentage": (12.0, 3.62, 0.1, -0.8),
+    "Healthcare_Cost_Percentage": (9.67, 1.69, 0.35, 0.6),
+    "Education_Cost_Percentage": (6.09, 1.13, 0.4, 0.5),
+    "Transportation_Cost_Percentage": (10.11, 2.36, -0.55, 0.6),
+}
+
+# Anteil der Streuung der Prozentwerte, der von Jahr zu Jahr statt zwischen den Ländern entsteht
+YEAR_NOISE = 0.4
+
+# Relative Abweichung der Werte einer doppelten Zeile vom Original
+DUPLICATE_NOISE = 0.01
+
+
+def countries_for_rows(
+        rows: int,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        duplicate_rate: float = 0.0
+) -> int:
+    """
+        Anzahl Länder, mit der die erzeugte Datei etwa die gewünschte Anzahl Zeilen hat.
+
+    :param rows: Gewünschte Anzahl Zeilen
+    :param start_year: Erstes Jahr
+    :param end_year: Letztes Jahr (einschließlich)
+    :param duplicate_rate: Anteil doppelter Zeilen
+    :return: Anzahl Länder (mindestens 1)
+    """
+
+    return max(1, round(rows / ((end_year - start_year + 1) * (1 + duplicate_rate))))
+
+
+# Daniel Schor
+def generate_block(
+        rng: np.random.Generator,
+        first_country: int,
+        countries: int,
+        years: np.ndarray,
+        duplicate_rate: float = 0.0,
+        missing_rate: float = 0.0,
+        shuffle: bool = False,
+        name_width: int = 6
+) -> pd.DataFrame:
+    """
+        Erzeugt die Zeilen eines Blocks von Ländern.
+
+    :param rng: Zufallsgenerator
+    :param first_country: Nummer des ersten Landes im Block (für den Namen)
+    :param countries: Anzahl Länder im Block
+    :param years: Die Jahre jedes Landes
+    :param duplicate_rate: Anteil zusätzlicher, leicht abweichender Zeilen für ein bereits vorhandenes Land und Jahr
+    :param missing_rate: Anteil fehlender Zahlenwerte (leere Felder)
+    :param shuffle: Zeilen im Block zufällig anordnen statt nach Land und Jahr
+    :param name_width: Anzahl Ziffern der Ländernamen
+    :return: DataFrame mit den Spalten aus COLUMNS
+    """
+
+    n_years = len(years)
+
+    # Merkmale je Land: Einkommensniveau und gemeinsamer Faktor der Ausgaben (beide standardnormalverteilt)
+    income_level = rng.standard_normal(countries)
+    spending = rng.standard_normal(countries)
+
+    # Einkommen als Zufallsbewegung mit länderspezifischem Wachstum, Mittelwert im mittleren Jahr
+    growth = rng.normal(INCOME_GROWTH[0], INCOME_GROWTH[1], (countries, 1)) \
+        + rng.normal(0, INCOME_GROWTH[2], (countries, n_years))
+    log_income = np.cumsum(growth, axis=1)
+    log_income += (LOG_INCOME[0] + LOG_INCOME[1] * income_level)[:, None] - log_income.mean(axis=1, keepdims=True)
+    income = np.exp(log_income)
+
+    cost_ratio = rng.normal(COST_RATIO[0], COST_RATIO[1], (countries, 1)) \
+        + rng.normal(0, COST_RATIO[2], (countries, n_years))
+
+    values = {
+        "Average_Monthly_Income": income.round(2),
+        "Cost_of_Living": (income * cost_ratio).round(2),
+    }
+
+    for column, (mean, std, income_weight, spending_weight) in PERCENTAGES.items():
+        own = rng.standard_normal(countries) * math.sqrt(1 - income_weight ** 2 - spending_weight ** 2)
+        country_value = income_weight * income_level + spending_weight * spending + own
+        year_value = rng.standard_normal((countries, n_years))
+        values[column] = np.clip(
+            mean + std * (math.sqrt(1 - YEAR_NOISE ** 2) * country_value[:, None] + YEAR_NOISE * year_value),
+            0, 100).round(4)
+
+    country_ids = np.arange(first_country, first_country + countries)
+    names = np.array([f"Country_{country:0{name_width}d}" for country in country_ids], dtype=object)
+    regions = rng.choice(list(REGIONS), size=countries, p=np.array(list(REGIONS.values())) / sum(REGIONS.values()))
+
+    df = pd.DataFrame({
+        "Country": np.repeat(names, n_years),
+        "Year": np.tile(years, countries),
+        **{column: column_values.ravel() for column, column_values in values.items()},
+        "Region": np.repeat(regions, n_years),
+    }, columns=COLUMNS)
+
+    numeric_columns = COLUMNS[2:-1]
+
+    # Doppelte Zeilen: Kopien zufälliger Zeilen mit leicht abweichenden Werten, direkt hinter dem Original
+    if duplicate_rate > 0:
+        duplicates = df.iloc[np.flatnonzero(rng.random(len(df)) < duplicate_rate)].copy()
+        duplicates[numeric_columns] = (duplicates[numeric_columns] * rng.normal(
+            1, DUPLICATE_NOISE, (len(duplicates), len(numeric_columns)))).round(4)
+        df = pd.concat([df, duplicates]).sort_index(kind="stable").reset_index(drop=True)
+
+    # Fehlende Werte in den Zahlenspalten (Land, Jahr und Region sind immer vorhanden)
+    if missing_rate > 0:
+        values = df[numeric_columns].to_numpy()
+        values[rng.random(values.shape) < missing_rate] = np.nan
+        df[numeric_columns] = values
+
+    if shuffle:
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+    return df
+
+
+def generate_blocks(
+        countries: int,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        duplicate_rate: float = 0.0,
+        missing_rate: float = 0.0,
+        shuffle: bool = False,
+        seed: Optional[int] = 0,
+        block_size: int = 10_000
+) -> Iterator[pd.DataFrame]:
+    """
+        Erzeugt einen synthetischen Datensatz in der Form der CostOfLivingAndIncome-Daten blockweise, damit auch
+        Dateien mit Millionen Zeilen ohne den ganzen Datensatz im Speicher entstehen. Mittelwerte, Streuungen,
+        Korrelationen und die Entwicklung über die Jahre orientieren sich an data/Expanded_Country_Economic_Data.csv.
+        Mit gleichem seed und block_size ist das Ergebnis immer gleich.
+
+    :param countries: Anzahl Länder
+    :param start_year: Erstes Jahr
+    :param end_year: Letztes Jahr (einschließlich)
+    :param duplicate_rate: Anteil zusätzlicher Zeilen für ein bereits vorhandenes Land und Jahr
+    :param missing_rate: Anteil fehlender Zahlenwerte
+    :param shuffle: Zeilen innerhalb jedes Blocks zufällig anordnen
+    :param seed: Startwert des Zufallsgenerators (None für zufällige Daten)
+    :param block_size: Anzahl Länder je Block
+    :return: Iterator über die Blöcke
+    """
+
+    rng = np.random.default_rng(seed)
+    years = np.arange(start_year, end_year + 1)
+    name_width = max(6, len(str(countries)))
+
+    for first_country in range(0, countries, block_size):
+        yield generate_block(
+            rng, first_country + 1, min(block_size, countries - first_country), years,
+            duplicate_rate, missing_rate, shuffle, name_width)
+
+
+def generate_dataframe(
+        countries: int,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        duplicate_rate: float = 0.0,
+        missing_rate: float = 0.0,
+        shuffle: bool = False,
+        seed: Optional[int] = 0
+) -> pd.DataFrame:
+    """
+        Erzeugt einen synthetischen Datensatz als DataFrame (siehe generate_blocks).
+
+    :param countries: Anzahl Länder
+    :param start_year: Erstes Jahr
+    :param end_year: Letztes Jahr (einschließlich)
+    :param duplicate_rate: Anteil zusätzlicher Zeilen für ein bereits vorhandenes Land und Jahr
+    :param missing_rate: Anteil fehlender Zahlenwerte
+    :param shuffle: Zeilen zufällig anordnen
+    :param seed: Startwert des Zufallsgenerators
+    :return: Der Datensatz
+    """
+
+    return pd.concat(list(generate_blocks(
+        countries, start_year, end_year, duplicate_rate, missing_rate, shuffle, seed)), ignore_index=True)
+
+
+def write_csv(
+        path: str,
+        countries: int,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        duplicate_rate: float = 0.0,
+        missing_rate: float = 0.0,
+        shuffle: bool = False,
+        seed: Optional[int] = 0
+) -> int:
+    """
+        Schreibt einen synthetischen Datensatz blockweise als CSV-Datei. Die Datei wird erst nach dem letzten
+        Block unter ihrem Namen abgelegt, ein abgebrochener Lauf hinterlässt also keine halbe Datei.
+
+    :param path: Pfad der CSV-Datei
+    :param countries: Anzahl Länder
+    :param start_year: Erstes Jahr
+    :param end_year: Letztes Jahr (einschließlich)
+    :param duplicate_rate: Anteil zusätzlicher Zeilen für ein bereits vorhandenes Land und Jahr
+    :param missing_rate: Anteil fehlender Zahlenwerte
+    :param shuffle: Zeilen innerhalb jedes Blocks zufällig anordnen
+    :param seed: Startwert des Zufallsgenerators
+    :return: Anzahl geschriebener Zeilen
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    rows = 0
+
+    try:
+        with open(temporary_path, "w", encoding="utf-8", newline="") as file:
+            for block in generate_blocks(
+                    countries, start_year, end_year, duplicate_rate, missing_rate, shuffle, seed):
+                block.to_csv(file, header=rows == 0, index=False)
+                rows += len(block)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+    return rows
+
+# Main ---------------------------------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Erzeugt eine synthetische CSV-Datei in der Form der CostOfLivingAndIncome-Daten.")
+    parser.add_argument("output", help="Pfad der CSV-Datei")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--rows", type=int, help="ungefähre Anzahl Zeilen")
+    size.add_argument("--countries", type=int, help="Anzahl Länder")
+    parser.add_argument("--start-year", type=int, default=2000, help="erstes Jahr (Standard 2000)")
+    parser.add_argument("--end-year", type=int, default=2023, help="letztes Jahr (Standard 2023)")
+    parser.add_argument(
+        "--duplicate-rate", type=float, default=0.0,
+        help="Anteil zusätzlicher Zeilen für ein bereits vorhandenes Land und Jahr (z.B. 0.05)")
+    parser.add_argument(
+        "--missing-rate", type=float, default=0.0, help="Anteil fehlender Zahlenwerte (z.B. 0.02)")
+    parser.add_argument(
+        "--shuffle", action="store_true", help="Zeilen zufällig statt nach Land und Jahr anordnen")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert des Zufallsgenerators (Standard 0)")
+    ARGS = parser.parse_args()
+
+    COUNTRIES = ARGS.countries or countries_for_rows(
+        ARGS.rows, ARGS.start_year, ARGS.end_year, ARGS.duplicate_rate)
+
+    ROWS = write_csv(
+        ARGS.output, COUNTRIES, ARGS.start_year, ARGS.end_year, ARGS.duplicate_rate, ARGS.missing_rate,
+        ARGS.shuffle, ARGS.seed)
+
+    print(f"{ROWS} rows, {COUNTRIES} countries: {ARGS.output}")
@@ -0,0 +1,96 @@
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ETL import ETL_Handler
+from generate_data import countries_for_rows, generate_dataframe
+
+
+def add_percentage_columns(
+        df: pd.DataFrame,
+        count: int,
+        seed: int = 0
+) -> pd.DataFrame:
+    """
+        Hängt zusätzliche Spalten mit "_Percentage" an, um den Speicherbedarf bei breiten Eingaben zu prüfen.
+
+    :param df: Die Rohdaten
+    :param count: Anzahl zusätzlicher Spalten
+    :param seed: Startwert des Generators
+    :return: Die Rohdaten mit den zusätzlichen Spalten
+    """
+
+    if not count:
+        return df
+
+    rng = np.random.default_rng(seed)
+    extra = pd.DataFrame(
+        rng.uniform(0.0, 5.0, (len(df), count)),
+        columns=[f"Extra_{index}_Percentage" for index in range(count)],
+        index=df.index)
+
+    return pd.concat([df, extra], axis=1)
+
+
+def measure_row_values(
+        df: pd.DataFrame
+) -> dict:
+    """
+        Misst mit tracemalloc den Spitzenwert der Allokationen von calc_row_values (Schritte 1-4) über der
+        bereits eingelesenen Eingabe.
+
+    :param df: Die Rohdaten (werden verändert)
+    :return: Größe der Eingabe und Spitzenwert in Bytes sowie das Verhältnis der beiden
+    """
+
+    input_bytes = int(df.memory_usage(deep=True).sum())
+    handler = ETL_Handler.wrap(df)
+
+    tracemalloc.start()
+    try:
+        traced_before = tracemalloc.get_traced_memory()[0]
+        handler.calc_row_values()
+        peak_bytes = tracemalloc.get_traced_memory()[1] - traced_before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "input_bytes": input_bytes,
+        "peak_bytes": peak_bytes,
+        "ratio": peak_bytes / max(input_bytes, 1),
+    }
+
+# Main ---------------------------------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prüft, dass die zeilenweisen Werte (calc_row_values) höchstens --budget mal die Größe der "
+                    "Eingabe zusätzlich belegen (gemessen mit tracemalloc).")
+    parser.add_argument("--rows", type=int, default=400_000, help="Zeilen der synthetischen Eingabe (Standard 400000)")
+    # Breite Eingaben zeigen die Kopien beim Umsortieren und Einfügen der Spalten am deutlichsten: mit 40
+    # zusätzlichen Spalten belegte die frühere Version mit move_to_neighbour etwa 1.5x die Eingabe
+    parser.add_argument(
+        "--extra-columns", type=int, default=40,
+        help="zusätzliche Spalten mit \"_Percentage\" (Standard 40, 0 für die 11 Spalten der echten Daten)")
+    parser.add_argument(
+        "--budget", type=float, default=1.0,
+        help="erlaubter Spitzenwert über der Eingabe als Vielfaches ihrer Größe (Standard 1.0, d.h. insgesamt "
+             "höchstens 2x die Eingabe)")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert des Generators (Standard 0)")
+    ARGS = parser.parse_args()
+
+    DF = generate_dataframe(countries_for_rows(ARGS.rows), seed=ARGS.seed)
+    DF = add_percentage_columns(DF, ARGS.extra_columns, ARGS.seed)
+
+    ROWS, COLUMNS = DF.shape
+    RESULT = measure_row_values(DF)
+
+    print(f"{ROWS} rows, {COLUMNS} columns: input {RESULT['input_bytes'] / 1024 ** 2:.1f} MB, "
+          f"peak {RESULT['peak_bytes'] / 1024 ** 2:.1f} MB ({RESULT['ratio']:.2f}x input, budget {ARGS.budget:.2f}x)")
+
+    if RESULT["ratio"] > ARGS.budget:
+        sys.exit(f"calc_row_values exceeds the memory budget: {RESULT['ratio']:.2f}x > {ARGS.budget:.2f}x")
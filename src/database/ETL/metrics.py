@@ -0,0 +1,224 @@
+import cProfile
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Dict, Optional
+
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError:
+    # Unter Windows gibt es das Modul nicht, der maximale Speicherbedarf wird dann nicht erfasst
+    resource = None
+
+
+def max_rss_mb() -> Optional[float]:
+    """
+        Höchster Speicherbedarf (RSS) des Prozesses seit dem Start in MB.
+
+    :return: Der Wert, oder None wenn er auf diesem System nicht verfügbar ist
+    """
+
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux liefert KiB, macOS Bytes
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def children_cpu_seconds() -> float:
+    """
+        CPU-Zeit aller beendeten Kindprozesse (z.B. des Prozess-Pools der Schritte 7-9). Unter Windows immer 0.
+
+    :return: Die CPU-Zeit in Sekunden
+    """
+
+    times = os.times()
+
+    return times.children_user + times.children_system
+
+
+def frame_shape(
+        frame
+) -> tuple:
+    """
+        Anzahl Zeilen und Spalten eines DataFrames.
+
+    :param frame: Der DataFrame oder None
+    :return: (Zeilen, Spalten), oder (None, None) ohne DataFrame
+    """
+
+    shape = getattr(frame, "shape", None)
+
+    return (int(shape[0]), int(shape[1])) if shape is not None and len(shape) == 2 else (None, None)
+
+
+# Daniel Schor
+class RunMetrics:
+    """
+        Erfasst Kennzahlen je Stufe eines ETL-Laufs: Laufzeit, CPU-Zeit, Speicherbedarf sowie Zeilen und Spalten vor
+        und nach der Stufe. Wird eine Stufe mehrfach ausgeführt (z.B. je Block beim blockweisen Einlesen), werden die
+        Werte zusammengefasst. Die Stufen dürfen nicht verschachtelt werden.
+
+    :param profile_dir: Verzeichnis für eine cProfile-Datei je Stufe (None deaktiviert das Profiling)
+    :param trace_memory: Spitzenwert der Python-Allokationen je Stufe mit tracemalloc erfassen (verlangsamt den Lauf)
+    """
+
+    def __init__(
+            self,
+            profile_dir: Optional[str] = None,
+            trace_memory: bool = False
+    ):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, dict] = {}
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(
+            self,
+            name: str,
+            frame: Callable = lambda: None
+    ):
+        """
+            Misst eine Stufe.
+
+        :param name: Name der Stufe
+        :param frame: Funktion, die den aktuellen DataFrame liefert (vor und nach der Stufe aufgerufen)
+        """
+
+        rows_in, columns_in = frame_shape(frame())
+
+        profile = None
+        if self.profile_dir is not None:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        children_started = children_cpu_seconds()
+        if profile is not None:
+            profile.enable()
+
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - wall_started
+            cpu = time.process_time() - cpu_started
+            children_cpu = children_cpu_seconds() - children_started
+            peak = (tracemalloc.get_traced_memory()[1] - traced_before) / (1024 * 1024) if self.trace_memory else None
+            rows_out, columns_out = frame_shape(frame())
+
+            entry = self.stages.setdefault(name, {
+                "name": name, "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "children_cpu_seconds": 0.0,
+                "tracemalloc_peak_mb": None,
+                "max_rss_mb": None, "rows_in": None, "columns_in": None, "rows_out": None, "columns_out": None,
+            })
+            entry["calls"] += 1
+            entry["wall_seconds"] += wall
+            entry["cpu_seconds"] += cpu
+            entry["children_cpu_seconds"] += children_cpu
+            if peak is not None:
+                entry["tracemalloc_peak_mb"] = max(entry["tracemalloc_peak_mb"] or 0.0, peak)
+            entry["max_rss_mb"] = max_rss_mb()
+            for key, value in [("rows_in", rows_in), ("rows_out", rows_out)]:
+                if value is not None:
+                    entry[key] = (entry[key] or 0) + value
+            for key, value in [("columns_in", columns_in), ("columns_out", columns_out)]:
+                if value is not None:
+                    entry[key] = value
+
+    def report(self) -> dict:
+        """
+            Erstellt den Bericht des Laufs.
+
+        :return: Der Bericht (JSON-kompatibel)
+        """
+
+        return {
+            "started_at": self.started_at.isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "wall_seconds": time.perf_counter() - self._wall_started,
+            "cpu_seconds": time.process_time() - self._cpu_started,
+            "max_rss_mb": max_rss_mb(),
+            "stages": list(self.stages.values()),
+        }
+
+    def write(
+            self,
+            report_dir: str,
+            extra: Optional[dict] = None
+    ) -> str:
+        """
+            Schreibt den Bericht als JSON-Datei (etl-<Zeitstempel>.json) und die cProfile-Dateien der Stufen.
+
+        :param report_dir: Verzeichnis des Berichts
+        :param extra: Zusätzliche Angaben zum Lauf (z.B. Quelldatei und Status)
+        :return: Pfad des Berichts
+        """
+
+        os.makedirs(report_dir, exist_ok=True)
+        report = {**(extra or {}), **self.report()}
+
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for position, (name, profile) in enumerate(self.profiles.items()):
+                path = os.path.join(self.profile_dir, f"{position:02d}_{re.sub(r'[^A-Za-z0-9_-]+', '_', name)}.prof")
+                profile.dump_stats(path)
+                self.stages[name]["profile"] = path
+
+        path = os.path.join(report_dir, f"etl-{self.started_at.strftime('%Y%m%dT%H%M%S%f')}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+        return path
+
+    def table(self) -> str:
+        """
+            Gibt die Kennzahlen der Stufen als Tabelle aus.
+
+        :return: Die Tabelle als Text
+        """
+
+        columns = ["name", "calls", "wall_seconds", "cpu_seconds", "children_cpu_seconds", "tracemalloc_peak_mb",
+                   "max_rss_mb", "rows_in", "rows_out", "columns_out"]
+
+        return tabulate([[stage[column] for column in columns] for stage in self.stages.values()],
+                        headers=columns, tablefmt="psql", floatfmt=".3f")
+
+
+def measure(
+        metrics: Optional[RunMetrics],
+        name: str,
+        frame: Callable = lambda: None
+) -> ContextManager:
+    """
+        Misst eine Stufe, falls Kennzahlen erfasst werden, sonst ohne jeden Aufwand.
+
+    :param metrics: Die Kennzahlen des Laufs oder None
+    :param name: Name der Stufe
+    :param frame: Funktion, die den aktuellen DataFrame liefert
+    :return: Der Kontextmanager
+    """
+
+    return nullcontext() if metrics is None else metrics.stage(name, frame)
@@ -0,0 +1,619 @@
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from ETL import (
+    ETL_Handler, build_and_publish, complete_partition, file_hash, interpolate_linear, publish_database,
+    published_path, verify_database
+)
+from metrics import RunMetrics, measure
+
+# Dateiformate der Artefakte: Dateiendung, Schreiben, Lesen
+ARTIFACT_FORMATS = {
+    "feather": (".feather", lambda df, path: df.to_feather(path), pd.read_feather),
+    "parquet": (".parquet", lambda df, path: df.to_parquet(path, index=False), pd.read_parquet),
+}
+
+# Dateiendung der Markierung einer abschließenden Stufe, die kein Artefakt schreibt
+DONE_SUFFIX = ".done.json"
+
+
+# Daniel Schor
+class Stage:
+    """
+        Eine Stufe der ETL-Pipeline. Die Stufe erhält die Ergebnisse ihrer Eingaben und gibt einen DataFrame zurück,
+        der als Artefakt unter einem Schlüssel aus den Schlüsseln der Eingaben, den verwendeten Einstellungen und der
+        Code-Version gespeichert wird. Ändert sich eines davon, wird die Stufe (und alles danach) neu berechnet.
+
+    :param name: Name der Stufe
+    :param function: Funktion (Einstellungen, *Ergebnisse der Eingaben) -> DataFrame
+    :param inputs: Namen der Stufen, deren Ergebnisse die Funktion erhält
+    :param settings: Einstellungen, von denen das Ergebnis abhängt (gehen in den Schlüssel ein)
+    :param code: Weitere Funktionen, deren Quelltext in die Code-Version eingeht
+    :param version: Von Hand erhöhbare Version, z.B. wenn sich das Verhalten einer Abhängigkeit ändert
+    :param sink: Die Stufe schreibt das Endergebnis (kein Artefakt, nur eine Markierung mit dem geschriebenen Pfad)
+    :param current: Bei einer abschließenden Stufe: Funktion (Einstellungen, Pfad) -> bool, die prüft, ob die
+        geschriebene Datei noch das aktuelle Ergebnis ist
+    """
+
+    def __init__(
+            self,
+            name: str,
+            function: Callable,
+            inputs: Sequence[str] = (),
+            settings: Sequence[str] = (),
+            code: Sequence[Callable] = (),
+            version: str = "1",
+            sink: bool = False,
+            current: Optional[Callable[[dict, str], bool]] = None
+    ):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.settings = list(settings)
+        self.code = list(code)
+        self.version = version
+        self.sink = sink
+        self.current = current
+
+    def code_version(self) -> str:
+        """
+            Hash über den Quelltext der Stufe und ihrer Abhängigkeiten, die Version der Stufe sowie die Versionen
+            von pandas und NumPy.
+
+        :return: Die Code-Version als Hex-String
+        """
+
+        digest = hashlib.sha256(f"{self.version}|{pd.__version__}|{np.__version__}".encode())
+        for function in [self.function] + self.code:
+            digest.update(inspect.getsource(function).encode())
+
+        return digest.hexdigest()
+
+    def key(
+            self,
+            input_keys: List[str],
+            settings: dict
+    ) -> str:
+        """
+            Berechnet den Schlüssel des Artefakts. Da die Schlüssel der Eingaben eingehen, ändert sich mit
+            der Quelldatei der Schlüssel jeder nachfolgenden Stufe.
+
+        :param input_keys: Schlüssel der Eingaben
+        :param settings: Alle Einstellungen des Laufs
+        :return: Der Schlüssel als Hex-String
+        """
+
+        content = json.dumps({
+            "stage": self.name,
+            "code": self.code_version(),
+            "inputs": input_keys,
+            "settings": {name: settings.get(name) for name in self.settings},
+        }, sort_keys=True, default=str)
+
+        return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+class Pipeline:
+    """
+        Führt die Stufen in Abhängigkeit voneinander aus und speichert jedes Zwischenergebnis als Artefakt
+        (Feather oder Parquet). Bei einem erneuten Lauf werden vorhandene Artefakte geladen, berechnet wird erst
+        ab der ersten Stufe, deren Schlüssel sich geändert hat. Ergebnisse, die keine Stufe mehr benötigt,
+        werden sofort freigegeben.
+
+    :param stages: Die Stufen (Eingaben müssen vor der Stufe stehen, die sie verwendet)
+    :param artifact_dir: Verzeichnis der Artefakte
+    :param artifact_format: "feather" oder "parquet"
+    """
+
+    def __init__(
+            self,
+            stages: List[Stage],
+            artifact_dir: str,
+            artifact_format: str = "feather"
+    ):
+        if artifact_format not in ARTIFACT_FORMATS:
+            raise ValueError(f"unknown artifact format {artifact_format!r}")
+
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if missing:
+                raise ValueError(f"stage {stage.name!r} uses unknown or later stages {missing}")
+            self.stages[stage.name] = stage
+
+        self.artifact_dir = artifact_dir
+        self.artifact_format = artifact_format
+
+    def keys(
+            self,
+            settings: dict
+    ) -> Dict[str, str]:
+        """
+            Berechnet die Schlüssel aller Stufen.
+
+        :param settings: Alle Einstellungen des Laufs
+        :return: Schlüssel je Stufe
+        """
+
+        keys = {}
+        for name, stage in self.stages.items():
+            keys[name] = stage.key([keys[input_name] for input_name in stage.inputs], settings)
+
+        return keys
+
+    def dependents(
+            self,
+            name: str
+    ) -> List[str]:
+        """
+            Ermittelt die Stufe und alle Stufen, die direkt oder indirekt ihr Ergebnis verwenden.
+
+        :param name: Name der Stufe
+        :return: Namen der Stufen in Reihenfolge der Pipeline
+        """
+
+        if name not in self.stages:
+            raise ValueError(f"unknown stage {name!r}, expected one of {list(self.stages)}")
+
+        affected = {name}
+        for stage_name, stage in self.stages.items():
+            if any(input_name in affected for input_name in stage.inputs):
+                affected.add(stage_name)
+
+        return [stage_name for stage_name in self.stages if stage_name in affected]
+
+    def artifact_path(
+            self,
+            stage: Stage,
+            key: str
+    ) -> str:
+        """
+            Pfad des Artefakts bzw. der Markierung einer Stufe für einen Schlüssel.
+
+        :param stage: Die Stufe
+        :param key: Der Schlüssel
+        :return: Der Pfad
+        """
+
+        suffix = DONE_SUFFIX if stage.sink else ARTIFACT_FORMATS[self.artifact_format][0]
+
+        return os.path.join(self.artifact_dir, f"{stage.name}-{key}{suffix}")
+
+    def is_cached(
+            self,
+            stage: Stage,
+            key: str,
+            settings: dict
+    ) -> bool:
+        """
+            Prüft, ob das Ergebnis einer Stufe vorliegt. Bei einer abschließenden Stufe muss zusätzlich die
+            geschriebene Datei unverändert vorhanden und noch aktuell sein.
+
+        :param stage: Die Stufe
+        :param key: Der Schlüssel
+        :param settings: Alle Einstellungen des Laufs
+        :return: True, wenn die Stufe nicht ausgeführt werden muss
+        """
+
+        path = self.artifact_path(stage, key)
+        if not os.path.isfile(path):
+            return False
+        if not stage.sink:
+            return True
+
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                done = json.load(file)
+            return os.stat(done["path"]).st_mtime_ns == done["mtime_ns"] and (
+                stage.current is None or stage.current(settings, done["path"]))
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def write_artifact(
+            self,
+            stage: Stage,
+            key: str,
+            result
+    ) -> None:
+        """
+            Speichert das Ergebnis einer Stufe. Die Datei wird erst unter einem temporären Namen geschrieben
+            und dann umbenannt, sodass ein abgebrochener Lauf kein halbes Artefakt hinterlässt.
+
+        :param stage: Die Stufe
+        :param key: Der Schlüssel
+        :param result: DataFrame bzw. bei einer abschließenden Stufe der Pfad der geschriebenen Datei
+        """
+
+        path = self.artifact_path(stage, key)
+        temporary = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+        if stage.sink:
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump({"path": result, "mtime_ns": os.stat(result).st_mtime_ns}, file)
+        else:
+            # Feather und Parquet speichern keinen beliebigen Index, die Stufen arbeiten nur mit Spalten
+            ARTIFACT_FORMATS[self.artifact_format][1](result.reset_index(drop=True), temporary)
+
+        os.replace(temporary, path)
+
+    def read_artifact(
+            self,
+            stage: Stage,
+            key: str
+    ) -> pd.DataFrame:
+        """
+            Lädt das Artefakt einer Stufe.
+
+        :param stage: Die Stufe
+        :param key: Der Schlüssel
+        :return: Das Ergebnis der Stufe
+        """
+
+        return ARTIFACT_FORMATS[self.artifact_format][2](self.artifact_path(stage, key))
+
+    def run(
+            self,
+            settings: dict,
+            rerun: Sequence[str] = (),
+            metrics: Optional[RunMetrics] = None
+    ) -> Dict[str, str]:
+        """
+            Führt die Pipeline aus. Ausgehend von den abschließenden Stufen (bzw. der letzten Stufe) werden nur die
+            Eingaben geladen oder berechnet, die tatsächlich benötigt werden.
+
+        :param settings: Alle Einstellungen des Laufs
+        :param rerun: Diese Stufen und alle danach auf jeden Fall neu berechnen
+        :param metrics: Kennzahlen der berechneten Stufen erfassen
+        :return: Status je Stufe ("cached", "computed" oder "skipped")
+        """
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        keys = self.keys(settings)
+        forced = {name for stage_name in rerun for name in self.dependents(stage_name)}
+        status = {name: "skipped" for name in self.stages}
+        results = {}
+
+        targets = [name for name, stage in self.stages.items() if stage.sink] or [list(self.stages)[-1]]
+
+        # Anzahl der Stufen, die ein Ergebnis noch verwenden
+        consumers = {name: 0 for name in self.stages}
+
+        def evaluate(name: str):
+            stage = self.stages[name]
+            key = keys[name]
+
+            if name not in forced and self.is_cached(stage, key, settings):
+                # Ein bereits freigegebenes Ergebnis dieses Laufs wird aus dem Artefakt neu geladen
+                if status[name] == "skipped":
+                    status[name] = "cached"
+                return None if stage.sink else self.read_artifact(stage, key)
+
+            for input_name in stage.inputs:
+                consumers[input_name] += 1
+            inputs = [result_of(input_name) for input_name in stage.inputs]
+
+            # Zeilen und Spalten vor der Stufe beziehen sich auf die erste Eingabe
+            current = inputs[0] if inputs else None
+            with measure(metrics, name, lambda: current):
+                current = stage.function(settings, *inputs)
+            result = current
+            del inputs, current
+            for input_name in stage.inputs:
+                release(input_name)
+
+            self.write_artifact(stage, key, result)
+            status[name] = "computed"
+
+            return result
+
+        def result_of(name: str):
+            if name not in results:
+                results[name] = evaluate(name)
+            return results[name]
+
+        def release(name: str) -> None:
+            consumers[name] -= 1
+            if consumers[name] == 0:
+                results.pop(name, None)
+
+        for target in targets:
+            result_of(target)
+
+        self.prune(keys)
+
+        return status
+
+    def prune(
+            self,
+            keys: Dict[str, str]
+    ) -> None:
+        """
+            Löscht alle Artefakte der Stufen, die nicht zum angegebenen Stand gehören.
+
+        :param keys: Aktuelle Schlüssel je Stufe
+        """
+
+        current = {os.path.basename(self.artifact_path(stage, keys[name])) for name, stage in self.stages.items()}
+        for name in self.stages:
+            for path in glob.glob(os.path.join(glob.escape(self.artifact_dir), f"{glob.escape(name)}-*")):
+                if os.path.basename(path) not in current:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+# Stufen ---------------------------------------------------------------------------------------------------------
+
+
+def handler_for(
+        settings: dict,
+        df: Optional[pd.DataFrame]
+) -> ETL_Handler:
+    """
+        Erstellt den Handler einer Stufe für die Daten ihrer Eingabe.
+
+    :param settings: Alle Einstellungen des Laufs
+    :param df: Die Daten
+    :return: Der Handler
+    """
+
+    return ETL_Handler.wrap(df, settings["start_year"], settings["end_year"], settings.get("workers"),
+                            settings.get("csv_path"))
+
+
+def extract(settings: dict) -> pd.DataFrame:
+    """
+        Einlesen der CSV-Datei (mit bereinigten Spaltennamen).
+    """
+
+    handler = handler_for(settings, None)
+    handler.extract()
+    handler._df.columns = handler._df.columns.str.strip()
+
+    return handler._df
+
+
+def net_income(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        1. Berechnung des Nettoeinkommens
+    """
+
+    handler = handler_for(settings, df)
+    handler.calc_net_income()
+
+    return handler._df
+
+
+def sum_percentage(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        2. Berechnung der Summe der Prozentwerte
+    """
+
+    handler = handler_for(settings, df)
+    handler.add_sum("Sum_Percentage", [column for column in df.columns if column.endswith(
+        "Percentage") and column != "Savings_Percentage"])
+
+    return handler._df
+
+
+def real_values(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        3. Berechnung der Dollar-Werte
+    """
+
+    handler = handler_for(settings, df)
+    handler.calc_real_values()
+
+    return handler._df
+
+
+def sum_costs(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        4. Berechnung der Summe aller Kosten
+    """
+
+    handler = handler_for(settings, df)
+    handler.add_sum("Sum_Costs", [column for column in df.columns if column.endswith("Cost")])
+
+    return handler._df
+
+
+def regions(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        5. Speichern der Regionen (hängt nur von den Rohdaten ab)
+    """
+
+    return df.groupby("Country")["Region"].first().reset_index()
+
+
+def group(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        6. Gruppierung nach Land und Jahr (aggregieren anhand des Mittelwerts) und Ordnen der Spalten
+    """
+
+    handler = handler_for(settings, df.groupby(["Country", "Year"], as_index=False).mean(numeric_only=True))
+    handler.order_columns()
+
+    return handler._df
+
+
+def fill(settings: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """
+        7.-8. Sortierung nach Land und Jahr und Füllen fehlender Werte mit linearer Interpolation
+    """
+
+    handler = handler_for(settings, df)
+    handler.complete(None)
+
+    return handler._df
+
+
+def assign_regions(settings: dict, df: pd.DataFrame, region_table: pd.DataFrame) -> pd.DataFrame:
+    """
+        9. Füllen der Regionen
+    """
+
+    region_dict = dict(zip(region_table["Country"], region_table["Region"]))
+    df["Region"] = df["Country"].map(region_dict)
+
+    return df
+
+
+def load(settings: dict, df: pd.DataFrame) -> str:
+    """
+        Speichern in der SQLite-Datenbank, mit PUBLISH als neue, geprüfte und veröffentlichte Version.
+        Gibt den Pfad der geschriebenen Datei zurück.
+    """
+
+    handler = handler_for(settings, df)
+    db_path = settings["db_path"]
+    table_name = settings["table_name"]
+
+    if not settings.get("publish", True):
+        handler.save_to_db(db_path, table_name)
+        return db_path
+
+    def build(new_path: str) -> str:
+        rows_per_second = handler.save_to_db(new_path, table_name, journal=False)
+        return f"full build ({len(handler._df)} rows, {rows_per_second:.0f} rows/s)"
+
+    build_and_publish(db_path, table_name, build, settings.get("keep_versions", 3))
+
+    return published_path(db_path)
+
+
+def is_loaded(settings: dict, path: str) -> bool:
+    """
+        Prüft, ob die zuletzt geschriebene Datenbank noch die aktive ist (und nicht etwa ein anderer Lauf von
+        ETL.py inzwischen eine neue Version veröffentlicht hat).
+    """
+
+    if not settings.get("publish", True):
+        return path == settings["db_path"]
+
+    return published_path(settings["db_path"]) == path
+
+
+# Stufen des ETL in der Reihenfolge der Transformation (siehe ETL_Handler.transform)
+ETL_STAGES = [
+    Stage("extract", extract, settings=["source_hash"], code=[ETL_Handler.extract]),
+    Stage("net_income", net_income, ["extract"], code=[ETL_Handler.calc_net_income]),
+    Stage("sum_percentage", sum_percentage, ["net_income"], code=[ETL_Handler.add_sum]),
+    Stage("real_values", real_values, ["sum_percentage"], code=[ETL_Handler.calc_real_values]),
+    Stage("sum_costs", sum_costs, ["real_values"], code=[ETL_Handler.add_sum]),
+    Stage("regions", regions, ["extract"]),
+    Stage("group", group, ["sum_costs"], code=[ETL_Handler.order_columns]),
+    Stage("fill", fill, ["group"], settings=["start_year", "end_year"], code=[
+        ETL_Handler.complete, ETL_Handler.complete_parallel, ETL_Handler.partition_by_country,
+        ETL_Handler.fill_missing_values, complete_partition, interpolate_linear]),
+    Stage("assign_regions", assign_regions, ["fill", "regions"]),
+    Stage("load", load, ["assign_regions"], settings=["db_path", "table_name", "publish"], code=[
+        ETL_Handler.save_to_db, ETL_Handler.create_table, ETL_Handler.insert_rows, ETL_Handler.create_indexes,
+        ETL_Handler.write_run_id,
+        ETL_Handler.save_region_aggregates, build_and_publish, verify_database, publish_database],
+        sink=True, current=is_loaded),
+]
+
+
+def run_pipeline(
+        csv_path: str,
+        db_path: str,
+        table_name: str,
+        artifact_dir: str,
+        start_year: int = 2000,
+        end_year: int = 2023,
+        workers: Optional[int] = None,
+        publish: bool = True,
+        keep_versions: int = 3,
+        artifact_format: str = "feather",
+        rerun: Sequence[str] = (),
+        metrics: Optional[RunMetrics] = None
+) -> Dict[str, str]:
+    """
+        Führt das ETL als Pipeline mit zwischengespeicherten Stufen aus. Bei unveränderter Quelldatei und
+        unverändertem Code ist nach dem Hash der Quelldatei nichts zu tun.
+
+    :param csv_path: Pfad zur CSV-Datei
+    :param db_path: Konfigurierter Pfad zur Datenbank
+    :param table_name: Name der Tabelle in der SQLite-Datenbank
+    :param artifact_dir: Verzeichnis der Artefakte
+    :param start_year: Erstes Jahr der Tabelle
+    :param end_year: Letztes Jahr der Tabelle (einschließlich)
+    :param workers: Anzahl Prozesse für die Schritte 7-9 (siehe ETL_Handler)
+    :param publish: Als neue Version veröffentlichen (siehe run_publish), sonst direkt in db_path schreiben
+    :param keep_versions: Anzahl der Versionen, die behalten werden
+    :param artifact_format: "feather" oder "parquet"
+    :param rerun: Diese Stufen und alle danach auf jeden Fall neu berechnen
+    :param metrics: Kennzahlen der berechneten Stufen erfassen
+    :return: Status je Stufe
+    """
+
+    settings = {
+        "csv_path": os.path.abspath(csv_path),
+        "source_hash": file_hash(csv_path),
+        "db_path": os.path.abspath(db_path),
+        "table_name": table_name,
+        "start_year": start_year,
+        "end_year": end_year,
+        "workers": workers,
+        "publish": publish,
+        "keep_versions": keep_versions,
+    }
+
+    return Pipeline(ETL_STAGES, artifact_dir, artifact_format).run(settings, rerun, metrics)
+
+# Main ---------------------------------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Führt das ETL als Pipeline aus und berechnet nur die Stufen neu, die sich geändert haben.")
+    parser.add_argument(
+        "--rerun", action="append", default=[], choices=[stage.name for stage in ETL_STAGES],
+        help="diese Stufe und alle danach neu berechnen (mehrfach möglich)")
+    parser.add_argument(
+        "--profile", metavar="DIR", help="für jede berechnete Stufe eine cProfile-Datei in DIR schreiben")
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help="Spitzenwert der Speicherallokationen je Stufe mit tracemalloc messen (verlangsamt den Lauf)")
+    ARGS = parser.parse_args()
+
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    CONFIG_FILE = os.path.join(ROOT, "ETL/ETL_Config.yaml")
+
+    with open(CONFIG_FILE, "r") as file:
+        CONFIG: dict = dict(yaml.safe_load(file))
+
+    METRICS = RunMetrics(ARGS.profile, ARGS.trace_memory)
+
+    STATUS = run_pipeline(
+        os.path.join(ROOT, CONFIG["CSV_PATH"]),
+        os.path.join(ROOT, CONFIG["DB_NAME"]),
+        CONFIG["TABLE_NAME"],
+        os.path.join(ROOT, CONFIG.get("ARTIFACT_DIR", "ETL/.artifacts")),
+        CONFIG.get("START_YEAR", 2000),
+        CONFIG.get("END_YEAR", 2023),
+        CONFIG.get("WORKERS"),
+        CONFIG.get("PUBLISH", True),
+        CONFIG.get("KEEP_VERSIONS", 3),
+        CONFIG.get("ARTIFACT_FORMAT", "feather"),
+        ARGS.rerun,
+        METRICS)
+
+    for NAME, STATE in STATUS.items():
+        print(f"{NAME:<16} {STATE}")
+
+    if CONFIG.get("REPORT_DIR"):
+        print(METRICS.table())
+        print("report:", METRICS.write(os.path.join(ROOT, CONFIG["REPORT_DIR"]), {
+            "csv_path": CONFIG["CSV_PATH"], "status": STATUS, "config": CONFIG}))
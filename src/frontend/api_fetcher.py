@@ -1,13 +1,236 @@
-from typing import List
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
+import pandas as pd
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util import Retry
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from helper import convert_to_dataframe
+from response_cache import VersionedCache
 
 #_host = "http://localhost:8000"
 _host = "http://backend:8000"
 
+_ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Zeitlimits in Sekunden für den Verbindungsaufbau und das Lesen der Antwort
+_TIMEOUT = (3.05, 30)
+
+# Wiederholungen fehlgeschlagener Anfragen (Verbindungsfehler und 502/503/504, z.B. während das Backend neu startet)
+# mit exponentiell wachsender Wartezeit: 0.2 s, 0.4 s, 0.8 s
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    raise_on_status=False
+)
+
+# Anzahl offener Verbindungen zum Backend, die wiederverwendet werden (Keep-Alive)
+_POOL_SIZE = 10
+
+# Grenzen des Antwort-Caches (0 Einträge deaktiviert ihn) und Mindestabstand in Sekunden zwischen zwei Abfragen
+# der Datenversion (/version); überschreibbar über Umgebungsvariablen
+_CACHE_MAX_ENTRIES = int(os.environ.get("FRONTEND_CACHE_MAX_ENTRIES", 256))
+_CACHE_MAX_BYTES = int(os.environ.get("FRONTEND_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+_VERSION_CHECK_INTERVAL = float(os.environ.get("FRONTEND_VERSION_CHECK_INTERVAL", 2.0))
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    """
+        Gemeinsame Session für alle Anfragen an das Backend. Sie hält die Verbindungen offen (Keep-Alive) und
+        verwendet sie wieder, statt für jede Anfrage eine neue TCP-Verbindung aufzubauen. Wird einmal je
+        Streamlit-Prozess erstellt und von allen Sitzungen und Threads geteilt.
+
+    :return: Die Session
+    """
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_POOL_SIZE, max_retries=_RETRY)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def _get(
+    url: str,
+    headers: Optional[dict] = None
+) -> Optional[requests.Response]:
+    """
+        Sendet eine GET-Anfrage über die gemeinsame Session mit Zeitlimit und Wiederholungen.
+
+    :param url: Die URL des Endpunkts
+    :param headers: Zusätzliche Header
+
+    :return: Die Antwort, oder None wenn das Backend nicht erreichbar ist
+    """
+
+    try:
+        return _session().get(url, headers=headers, timeout=_TIMEOUT)
+    except requests.RequestException:
+        return None
+
+
+def fetch_concurrently(
+    *calls: Callable[[], object]
+) -> list:
+    """
+        Führt voneinander unabhängige Abrufe gleichzeitig in einem Thread-Pool aus, sodass die Seite nur so lange
+        wartet wie der langsamste Abruf statt der Summe aller. Die Threads erhalten den Kontext des laufenden
+        Skripts, damit st.error und st.cache_resource darin funktionieren.
+
+    :param calls: Die Abrufe als Funktionen ohne Parameter (z.B. fetch_regions oder functools.partial(...))
+
+    :return: Die Ergebnisse in der Reihenfolge der Abrufe
+    """
+
+    if len(calls) < 2:
+        return [call() for call in calls]
+
+    ctx = get_script_run_ctx()
+
+    def run(call: Callable[[], object]) -> object:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        return list(executor.map(run, calls))
+
+
+@st.cache_resource
+def _cache() -> VersionedCache:
+    """
+        Cache für die Antworten des Backends, einmal je Streamlit-Prozess erstellt und von allen Sitzungen geteilt.
+
+    :return: Der Cache
+    """
+
+    return VersionedCache(_CACHE_MAX_ENTRIES, _CACHE_MAX_BYTES, _VERSION_CHECK_INTERVAL)
+
+
+def _fetch_version() -> Optional[str]:
+    """
+        Ruft die aktuelle Datenversion vom Backend ab (/version).
+
+    :return: Die Version, oder None wenn das Backend nicht erreichbar ist oder keine Version liefert
+    """
+
+    response = _get(f"{_host}/version")
+    if response is None or response.status_code != 200:
+        return None
+
+    return response.json().get("version")
+
+
+def _cached_fetch(
+    url: str,
+    headers: dict,
+    error_message: str,
+    empty: object,
+    parse: Callable[[str, bytes], object]
+) -> object:
+    """
+        Ruft eine URL ab und speichert die Antwort im Cache unter der aktuellen Datenversion.
+        Bis das Backend eine neue Version meldet, wird sie ohne Anfrage aus dem Cache gelesen.
+        Fehlgeschlagene Anfragen werden nicht gespeichert. Ist die Version unbekannt, wird ohne Cache abgerufen.
+
+    :param url: Die URL des Endpunkts (mit allen Parametern, bildet zusammen mit Accept den Schlüssel)
+    :param headers: Header der Anfrage
+    :param error_message: Fehlermeldung, falls die Anfrage fehlschlägt
+    :param empty: Ergebnis bei einem Fehler
+    :param parse: Funktion, die das Ergebnis aus Content-Type und Inhalt der Antwort liest
+
+    :return: Das Ergebnis (bei jedem Aufruf ein neues Objekt)
+    """
+
+    cache = _cache()
+    version = cache.current_version(_fetch_version)
+    key = (url, headers.get("Accept"))
+
+    cached = cache.get(version, key) if version is not None else None
+    if cached is not None:
+        return parse(*cached)
+
+    response = _get(url, headers)
+    if response is None or response.status_code != 200:
+        st.error(error_message)
+        return empty
+
+    content_type = response.headers.get("content-type", "")
+    if version is not None:
+        cache.put(version, key, content_type, response.content)
+
+    return parse(content_type, response.content)
+
+
+def _fetch_json(
+    url: str,
+    error_message: str
+) -> object:
+    """
+        Ruft JSON-Daten ab (über den Cache).
+
+    :param url: Die URL des Endpunkts
+    :param error_message: Fehlermeldung, falls die Anfrage fehlschlägt
+
+    :return: Die Daten (leeres Dict bei einem Fehler)
+    """
+
+    return _cached_fetch(url, {}, error_message, {}, lambda content_type, content: json.loads(content))
+
+
+def _read_dataframe(
+    content_type: str,
+    content: bytes
+) -> pd.DataFrame:
+    """
+        Liest eine Antwort als DataFrame, als Arrow IPC Stream oder als JSON.
+
+    :param content_type: Content-Type der Antwort
+    :param content: Inhalt der Antwort
+
+    :return: Die Daten als DataFrame
+    """
+
+    if content_type.startswith(_ARROW_MEDIA_TYPE):
+        return pa.ipc.open_stream(content).read_all().to_pandas()
+
+    return convert_to_dataframe(json.loads(content))
+
+
+def _fetch_dataframe(
+    url: str,
+    error_message: str
+) -> pd.DataFrame:
+    """
+        Ruft tabellarische Daten ab (über den Cache). Ist pyarrow installiert, wird ein Arrow IPC Stream angefordert
+        und spaltenweise in ein DataFrame gelesen, ansonsten (oder wenn das Backend nur JSON liefert) JSON, am besten
+        mit orient=columns in der URL (siehe convert_to_dataframe).
+
+    :param url: Die URL des Endpunkts
+    :param error_message: Fehlermeldung, falls die Anfrage fehlschlägt
+
+    :return: Die Daten als DataFrame (leer bei einem Fehler)
+    """
+
+    headers = {"Accept": f"{_ARROW_MEDIA_TYPE}, application/json;q=0.9"} if pa is not None else {}
+
+    return _cached_fetch(url, headers, error_message, pd.DataFrame(), _read_dataframe)
+
 # Eingeführt durch Esrom Johannes und ergänzt durch Davide Pedergnana
-@st.cache_data
 def fetch_recommendation_data(
     number_people: int,
     number_students: int,
@@ -15,9 +238,10 @@ def fetch_recommendation_data(
     extra_country: str,
     start_year: int,
     region: str
-) -> List[dict]:
+) -> dict:
     """
-        Ruft die Empfehlungen für die Top 3 Länder ab.
+        Ruft die Empfehlungen für die Top 3 Länder in der für das Balkendiagramm aufbereiteten Form ab
+        (view=chart, Spalten als Listen).
 
     :param number_people: Anzahl der Personen
     :param number_students: Anzahl der Studenten/Schüler
@@ -26,23 +250,18 @@ def fetch_recommendation_data(
     :param start_year: Startjahr
     :param region: Regionsfilter
 
-    :return: Liste der Top 3(+1) Länder
+    :return: Dict mit "countries" (Top 3(+1) Länder nach Rang), "disposable_income" (im Jahr 2023, in derselben
+        Reihenfolge) und "rows" (eine Liste pro Spalte, nach Rang und Jahr sortiert)
     """
 
-    url = f"{_host}/recommended-countries?number_people={number_people}&number_students={number_students}&number_workforce={number_workforce}&start_year={start_year}"
+    url = f"{_host}/recommended-countries?view=chart&orient=columns&number_people={number_people}&number_students={number_students}&number_workforce={number_workforce}&start_year={start_year}"
     if extra_country:
         url += f"&extra_country={extra_country}"
     if region:
         url += f"&region={region}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Error fetching country details")
-        return {}
+    return _fetch_json(url, "Error fetching country details")
 
 
-@st.cache_data
 def fetch_countries() -> list:
     """
         Ruft alle Länder ab
@@ -51,15 +270,9 @@ def fetch_countries() -> list:
     """
 
     url = f"{_host}/countries"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Error fetching country details")
-        return {}
+    return _fetch_json(url, "Error fetching country details")
 
 
-@st.cache_data
 def fetch_regions() -> list:
     """
         Ruft alle Regionen ab
@@ -68,34 +281,22 @@ def fetch_regions() -> list:
     """
 
     url = f"{_host}/regions"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Error fetching region details")
-        return {}
+    return _fetch_json(url, "Error fetching region details")
 
 
-@st.cache_data
-def fetch_region_data() -> dict:
+def fetch_region_data() -> pd.DataFrame:
     """
         Ruft die Daten für alle Regionen ab
 
     :return: Die Daten für alle Regionen
     """
 
-    response = requests.get(f'{_host}/region-information')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Error fetching data.")
-        return {}
+    return _fetch_dataframe(f'{_host}/region-information?orient=columns', "Error fetching data.")
 
 
-@st.cache_data
 def fetch_country_data(
     country: str
-) -> dict:
+) -> pd.DataFrame:
     """
         Ruft die Daten für das angegebene Land ab
 
@@ -104,10 +305,5 @@ def fetch_country_data(
     :return: Die Daten für das angegebene Land
     """
 
-    url = f"{_host}/country-information/?country={country}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Error fetching country details")
-        return {}
+    url = f"{_host}/country-information/?country={country}&orient=columns"
+    return _fetch_dataframe(url, "Error fetching country details")
@@ -1,38 +1,57 @@
+from typing import Union
+
+import numpy as np
 import pandas as pd
 
+# Datentypen der Spalten des Backends; alle anderen Spalten sind Zahlen (float64, None wird zu NaN)
+_COLUMN_DTYPES = {
+    "Country": object,
+    "Region": object,
+    "Year": np.int64,
+    "Rank": np.int64,
+}
+
 # Mavin-Moris Scholl
 
-def get_country_name_list(
-        data: list[dict]
-) -> list:
+def _to_column(
+        column: str,
+        values: list
+) -> np.ndarray:
     """
-        Gibt eine Liste der Länder zurück, die in den Daten enthalten sind. Die Reihenfolge entspricht der Reihenfolge in den Daten.
+        Wandelt die Werte einer Spalte in ein Array mit dem Datentyp der Spalte um.
 
-    :param data: Die Daten als Liste von Dictionaries.
+    :param column: Name der Spalte
+    :param values: Die Werte
 
-    :return: Eine Liste der Länder, die in den Daten enthalten sind.
+    :return: Die Werte als Array
     """
 
-    countries = []
-
-    for row in data:
-        if row["Country"] not in countries:
-            countries.append(row["Country"])
-
-    return countries
+    dtype = _COLUMN_DTYPES.get(column, np.float64)
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        # Unbekannte Spalte ohne Zahlen (oder Jahr mit fehlenden Werten)
+        return pd.Series(values).to_numpy()
 
 
 def convert_to_dataframe(
-        data: dict
+        data: Union[list, dict]
 ) -> pd.DataFrame:
     """
-        Konvertiert Daten in ein DataFrame
+        Konvertiert Daten in ein DataFrame. Die Spalten werden einzeln mit festen Datentypen erstellt
+        (Land/Region als Text, Jahr/Rang als int64, alle anderen als float64), so wie beim Arrow-Format.
 
-    :param data: Die Daten, die in ein DataFrame konvertiert werden sollen
+    :param data: Die Daten, die in ein DataFrame konvertiert werden sollen, als Liste von Dictionaries (orient=records)
+        oder als Dict mit einer Liste pro Spalte (orient=columns)
     :return: Ein DataFrame mit den konvertierten Daten
     """
 
     if not data:
         return pd.DataFrame()
 
-    return pd.DataFrame(data)
+    if isinstance(data, dict):
+        columns = data
+    else:
+        columns = {column: [row[column] for row in data] for column in data[0]}
+
+    return pd.DataFrame({column: _to_column(column, values) for column, values in columns.items()})
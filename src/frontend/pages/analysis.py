@@ -2,7 +2,6 @@ import streamlit as st
 import plotly.graph_objects as go
 
 from api_fetcher import fetch_country_data, fetch_countries
-from helper import convert_to_dataframe
 
 # Esrom.J | Daniel.S | Mavin-M.S | Davide.P
 
@@ -14,7 +13,7 @@ selected_country = st.sidebar.selectbox(
 )
 
 # -- Data Fetching --
-df_country = convert_to_dataframe(fetch_country_data(selected_country))
+df_country = fetch_country_data(selected_country)
 unique_years = sorted(df_country["Year"].unique())
 
 # -- Page Title --
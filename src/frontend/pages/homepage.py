@@ -2,9 +2,8 @@ import streamlit as st
 import plotly.graph_objects as go
 
 from api_fetcher import fetch_region_data
-from helper import convert_to_dataframe
 
-_df_region = convert_to_dataframe(fetch_region_data())
+_df_region = fetch_region_data()
 
 # Esrom.J | Daniel.S | Mavin-M.S | Davide.P
 
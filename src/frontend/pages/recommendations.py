@@ -1,10 +1,12 @@
 from enum import auto
+from typing import Optional
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 
-from api_fetcher import fetch_recommendation_data, fetch_countries, fetch_regions
-from helper import get_country_name_list
+from api_fetcher import fetch_recommendation_data, fetch_countries, fetch_regions, fetch_concurrently
+from helper import convert_to_dataframe
 
 # Esrom Johannes
 # ----------------------------- Constanten/Variablen -----------------------------
@@ -18,28 +20,58 @@ _COLORS = {
     "Gross Income": "#4daf4a"
 }
 
-# Um später das disposable income zu speichern
-_country_disposable_income = {}
+# Kostenarten der Kostenbalken in der Reihenfolge der Stapelung
+# (Spalte, Spalte der Basis, Spalte der Summe bis einschließlich dieser Kosten, Name)
+_COST_CATEGORIES = [
+    ("Housing_Cost", None, "Healthcare_Base", "Housing Cost"),
+    ("Healthcare_Cost", "Healthcare_Base", "Education_Base", "Healthcare Cost"),
+    ("Education_Cost", "Education_Base", "Transportation_Base", "Education Cost"),
+    ("Transportation_Cost", "Transportation_Base", "Sum_Costs", "Transportation Cost"),
+]
 
 # ----------------------------- Charts -----------------------------
 
 
-def create_stacked_bar_chart(
-        data: list[dict]
-) -> None:
+def _hovertemplate(
+        name: str,
+        total_label: Optional[str] = None
+) -> str:
     """
-        Erstellt ein gestapeltes Balkendiagramm, das die Entwicklung der Kosten und Einkommen über die Jahre für jedes Land anzeigt.
+        Erstellt den Hover-Text einer Balkenart. Die Werte stehen in customdata: [0] der Wert des Balkens,
+        [1] der Wert der zweiten Zeile (z.B. die Summe der Kosten bis zu diesem Balken).
+
+    :param name: Name der Balkenart (Schlüssel in _COLORS)
+    :param total_label: Beschriftung der zweiten Zeile (None für nur eine Zeile)
 
-    :param data: Die Daten als Liste von Dictionaries, die vom Backend geliefert werden.
+    :return: Das Hovertemplate für Plotly
     """
 
-    df = pd.DataFrame(data)
+    color = _COLORS[name]
+    template = f"<span style='color:{color};'>{name}</span><br>%{{customdata[0]:.2f}}"
 
-    fig = go.Figure()
+    if total_label is not None:
+        template += f"<br><span style='color:{color};'>{total_label}</span><br>%{{customdata[1]:.2f}}"
+
+    return template + "<extra></extra>"
 
-    country_names = get_country_name_list(data)
 
-    years = df['Year'].unique()
+def build_stacked_bar_figure(
+        chart: dict
+) -> go.Figure:
+    """
+        Erstellt das gestapelte Balkendiagramm der Kosten und Einkommen über die Jahre für jedes Land.
+        Das Backend liefert die Zeilen bereits nach Rang und Jahr sortiert mit Rang, Basen der gestapelten Kosten
+        und verfügbarem Einkommen (view=chart); jede Balkenart ist ein einziger Trace mit einem Balken je Land
+        und Jahr, die Werte für den Hover-Text stehen in customdata.
+
+    :param chart: Die Empfehlung vom Backend (siehe fetch_recommendation_data)
+
+    :return: Das Diagramm
+    """
+
+    df = convert_to_dataframe(chart["rows"])
+
+    country_names = chart["countries"]
 
     # -- Definition --
     # Balkenbreite
@@ -48,159 +80,58 @@ def create_stacked_bar_chart(
     gap_between_groups = 0.07
     # Abstand innerhalb der Gruppen
     gap_within_group = 0.03
+    # Abstand vor jedem Land
+    gap_between_countries = 0.3
 
-    # Positionstracker für die Balken
-    position = 0
-    x_labels = []
-    x_positions = []
-
-    # -- Durchlaufen der Länder --
-    for current_country in country_names:
-        # Abstand zwischen den Ländern
-        position += 0.3
-
-        # -- Durchlaufen der Jahre --
-        for year in sorted(years):
-
-            year_data = df[(df['Country'] == current_country)
-                           & (df['Year'] == year)]
-            if year_data.empty:
-                continue
-
-            # -- Durchlaufen der Balkenarten --
-            categories = ['Costs', 'Income']
-
-            for category in categories:
-                label = f"{year}<br>{country_names.index(current_country) + 1}"
-
-                x_labels.append(label)
-                x_positions.append(position)
-
-                # -- Costs Balken --
-                if category == 'Costs':
-                    # Housing Cost
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Housing_Cost'],
-                        name='Housing Cost',
-                        marker=dict(color=_COLORS["Housing Cost"]),
-                        width=width,
-                        hovertemplate=f"<span style='color:{_COLORS["Housing Cost"]};'>Housing Cost</span><br>{year_data['Housing_Cost'].values[0]:.2f}</span><extra></extra>"
-                    ))
-
-                    # Healthcare Cost
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Healthcare_Cost'],
-                        name='Healthcare Cost',
-                        marker=dict(color=_COLORS["Healthcare Cost"]),
-                        base=year_data['Housing_Cost'],
-                        width=width,
-                        hovertemplate=f"""<span style='color:{_COLORS["Healthcare Cost"]};'>Healthcare Cost</span>
-                            <br>{year_data['Healthcare_Cost'].values[0]:.2f}</span>
-                            <br><span style='color:{_COLORS["Healthcare Cost"]};'>Total</span>
-                            <br>{(year_data['Healthcare_Cost']+year_data['Housing_Cost']).values[0]:.2f}</span><extra></extra>
-                        """
-                    ))
-
-                    # Summe der bisherigen Kosten
-                    current_costs = year_data['Housing_Cost'] + \
-                        year_data['Healthcare_Cost']
-
-                    # Education Cost
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Education_Cost'],
-                        name='Education Cost',
-                        marker=dict(color=_COLORS["Education Cost"]),
-                        base=current_costs,
-                        width=width,
-                        hovertemplate=f"""<span style='color:{_COLORS["Education Cost"]};'>Education Cost</span>
-                            <br>{year_data['Education_Cost'].values[0]:.2f}</span>
-                            <br><span style='color:{_COLORS["Education Cost"]};'>Total</span>
-                            <br>{(year_data['Education_Cost']+current_costs).values[0]:.2f}</span><extra></extra>
-                        """
-                    ))
-
-                    # Summe der bisherigen Kosten aktualisieren
-                    current_costs += year_data['Education_Cost']
-
-                    # Transportation Cost
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Transportation_Cost'],
-                        name='Transportation Cost',
-                        marker=dict(color=_COLORS["Transportation Cost"]),
-                        base=current_costs,
-                        width=width,
-                        hovertemplate=f"""<span style='color:{_COLORS["Transportation Cost"]};'>Transportation Cost</span>
-                            <br>{year_data['Transportation_Cost'].values[0]:.2f}</span>
-                            <br><span style='color:{_COLORS["Transportation Cost"]};'>Total</span>
-                            <br>{(year_data['Transportation_Cost']+current_costs).values[0]:.2f}</span><extra></extra>
-                        """
-                    ))
-
-                    # Summe der bisherigen Kosten aktualisieren
-                    current_costs += year_data['Transportation_Cost']
-
-                # -- Income Balken --
-                elif category == 'Income':
-                    # Speichern des disposable incomes für die spätere Anzeige
-                    if (year_data['Year'] == 2023).values[0]:
-                        _country_disposable_income[current_country] = (
-                            year_data['Net_Income']-current_costs).values[0]
-
-                    # Nettoeinkommen
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Net_Income'],
-                        name='Net Income',
-                        marker=dict(color=_COLORS["Net Income"]),
-                        width=width,
-                        hovertemplate=f"""<span style='color:{_COLORS["Net Income"]};'>Net Income</span>
-                            <br>{year_data['Net_Income'].values[0]:.2f}
-                            <br><span style='color:{_COLORS["Net Income"]};'>Disposable income</span>
-                            <br>{(year_data['Net_Income']-current_costs).values[0]:.2f}</span><extra></extra>
-                        """
-                    ))
-
-                    # Bruttoeinkommen
-                    fig.add_trace(go.Bar(
-                        x=[position],
-                        y=year_data['Average_Monthly_Income'] -
-                        year_data['Net_Income'],
-                        name='Gross Income',
-                        marker=dict(color=_COLORS["Gross Income"]),
-                        width=width,
-                        hovertemplate=f"""<span style='color:{_COLORS["Gross Income"]};'>Gross Income</span>
-                            <br>{year_data['Average_Monthly_Income'].values[0]:.2f}
-                            <br><span style='color:{_COLORS["Gross Income"]};'>Tax</span>
-                            <br>{(year_data['Average_Monthly_Income']-year_data['Net_Income']).values[0]:.2f}</span><extra></extra>
-                        """
-                    ))
-
-                # Abstand Balken innerhalb einer Gruppe
-                position += gap_within_group + width
-
-            # Abstand von Gruppen
-            position += gap_between_groups
-
-    # Anpassen der x-Achse
-    new_x_positions = []
-    new_x_labels = []
-    for i in range(0, len(x_positions)-1, 2):
-        new_x_positions.append((x_positions[i] + x_positions[i+1]) / 2)
-        new_x_labels.append(x_labels[i].split("<br>")[0])
-
-    # Position für die Ländernamen
-    for index, i in enumerate(range(0, len(new_x_positions), len(years))):
-        avg_pos = sum(new_x_positions[i:i + len(years)]) / len(years)
-
-        new_x_positions.append(avg_pos - 0.001)
-
-        country_name = f"{index + 1}. {country_names[index]}"
-
-        new_x_labels.append(f"<br>{country_name}")
+    # -- Positionen: je Land und Jahr ein Kostenbalken und rechts daneben ein Einkommensbalken --
+    rank = df["Rank"].to_numpy() - 1
+    group_width = 2 * (width + gap_within_group) + gap_between_groups
+    cost_x = gap_between_countries * (rank + 1) + group_width * np.arange(len(df))
+    income_x = cost_x + width + gap_within_group
+
+    fig = go.Figure()
+
+    # -- Costs Balken: Housing unten, die weiteren Kosten jeweils auf der Summe der vorherigen --
+    for column, base_column, total_column, name in _COST_CATEGORIES:
+        fig.add_trace(go.Bar(
+            x=cost_x,
+            y=df[column],
+            base=df[base_column] if base_column else None,
+            name=name,
+            marker=dict(color=_COLORS[name]),
+            width=width,
+            customdata=df[[column, total_column]].to_numpy(),
+            hovertemplate=_hovertemplate(name, "Total" if base_column else None)
+        ))
+
+    # -- Income Balken: Nettoeinkommen mit der Steuer darauf gestapelt (zusammen das Bruttoeinkommen) --
+    fig.add_trace(go.Bar(
+        x=income_x,
+        y=df["Net_Income"],
+        name="Net Income",
+        marker=dict(color=_COLORS["Net Income"]),
+        width=width,
+        customdata=df[["Net_Income", "Disposable_Income"]].to_numpy(),
+        hovertemplate=_hovertemplate("Net Income", "Disposable income")
+    ))
+
+    fig.add_trace(go.Bar(
+        x=income_x,
+        y=df["Tax"],
+        name="Gross Income",
+        marker=dict(color=_COLORS["Gross Income"]),
+        width=width,
+        customdata=df[["Average_Monthly_Income", "Tax"]].to_numpy(),
+        hovertemplate=_hovertemplate("Gross Income", "Tax")
+    ))
+
+    # -- x-Achse: Jahr unter jeder Gruppe, Land unter der Mitte seiner Gruppen --
+    year_positions = (cost_x + income_x) / 2
+    country_positions = pd.Series(year_positions).groupby(rank).mean()
+
+    tick_positions = list(year_positions) + list(country_positions - 0.001)
+    tick_labels = [str(year) for year in df["Year"]] + [
+        f"<br>{index + 1}. {country_names[index]}" for index in country_positions.index]
 
     # -- Layout --
     fig.update_layout(
@@ -212,17 +143,32 @@ def create_stacked_bar_chart(
         height=800,
         width=1200,
         xaxis=dict(
-            tickvals=new_x_positions,
-            ticktext=new_x_labels,
+            tickvals=tick_positions,
+            ticktext=tick_labels,
             automargin=True
         )
     )
 
-    st.plotly_chart(fig)
+    return fig
+
+
+def create_stacked_bar_chart(
+        chart: dict
+) -> None:
+    """
+        Erstellt ein gestapeltes Balkendiagramm, das die Entwicklung der Kosten und Einkommen über die Jahre für jedes Land anzeigt.
+
+    :param chart: Die Empfehlung vom Backend (siehe fetch_recommendation_data)
+    """
+
+    st.plotly_chart(build_stacked_bar_figure(chart))
 
 
 # Mavin-Moris Scholl
 # ----------------------------- Aufbau -----------------------------
+# ---- Auswahllisten (gleichzeitig abgerufen) ----
+regions, countries = fetch_concurrently(fetch_regions, fetch_countries)
+
 # ---- Sidebar ----
 st.sidebar.title("Demographics")
 
@@ -258,13 +204,13 @@ number_workforce = st.sidebar.number_input(
 st.sidebar.title("Preferences")
 region = st.sidebar.selectbox(
     "Preferred Region",
-    [None] + fetch_regions(),
+    [None] + regions,
     index=0,
     help="Region of most interest."
 )
 extra_country = st.sidebar.selectbox(
     "Comparison Country",
-    [None] + fetch_countries(),
+    [None] + countries,
     index=0,
     help="Add an extra country for comparison."
 )
@@ -292,7 +238,7 @@ data = fetch_recommendation_data(
     region=region
 )
 
-if not data:
+if not data or not data["countries"]:
     st.error("No data available for the selected parameters.")
     st.stop()
 
@@ -320,8 +266,8 @@ with col2:
             potential.")
 
     recommendations = "\n".join(
-        [f"{i + 1}. {country} | {_country_disposable_income[country]:.2f}$" for i,
-            country in enumerate(get_country_name_list(data))]
+        [f"{i + 1}. {country} | {disposable_income:.2f}$" for i,
+            (country, disposable_income) in enumerate(zip(data["countries"], data["disposable_income"]))]
     )
 
     # ---- Top Matches ----
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+# Gespeicherte Antwort des Backends: Content-Type und Inhalt (beide unveränderlich)
+CachedResponse = Tuple[str, bytes]
+
+
+class VersionedCache:
+    """
+        Cache für die Antworten des Backends, gemeinsam für alle Sitzungen des Streamlit-Prozesses. Gespeichert
+        werden die Bytes der Antworten, nicht die daraus gelesenen DataFrames oder Dicts: jeder Aufruf liest
+        sein eigenes Objekt und kann es verändern, ohne andere Sitzungen zu beeinflussen.
+        Die Einträge gehören zur Datenversion des Backends (/version) und werden verworfen, sobald sie sich
+        ändert; ansonsten werden die am längsten nicht verwendeten verdrängt.
+
+    :param max_entries: Maximale Anzahl an Antworten (0 deaktiviert den Cache)
+    :param max_bytes: Maximale Summe der Antwortgrößen in Bytes
+    :param version_check_interval: Mindestabstand in Sekunden zwischen zwei Abfragen der Datenversion
+    """
+
+    def __init__(
+            self,
+            max_entries: int,
+            max_bytes: int,
+            version_check_interval: float
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_check_interval = version_check_interval
+
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._version: Optional[str] = None
+        self._current: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def current_version(
+            self,
+            fetch_version: Callable[[], Optional[str]]
+    ) -> Optional[str]:
+        """
+            Liefert die aktuelle Datenversion. Das Backend wird höchstens alle version_check_interval Sekunden
+            gefragt, dazwischen gilt das zuletzt erhaltene Ergebnis. Schlägt die Abfrage fehl, ist die Version bis
+            zur nächsten Abfrage unbekannt und die gespeicherten Antworten bleiben erhalten.
+
+        :param fetch_version: Funktion, die die Version vom Backend abruft (None bei einem Fehler)
+        :return: Die Version, oder None wenn sie nicht bekannt ist
+        """
+
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.version_check_interval:
+                return self._current
+
+        version = fetch_version()
+
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._current = version
+            if version is not None and version != self._version:
+                self._entries.clear()
+                self._size = 0
+                self._version = version
+
+        return version
+
+    def get(
+            self,
+            version: str,
+            key: Hashable
+    ) -> Optional[CachedResponse]:
+        """
+            Gibt die Antwort zurück, wenn sie zu dieser Datenversion gespeichert wurde.
+
+        :param version: Datenversion von current_version
+        :param key: Schlüssel der Anfrage
+        :return: Content-Type und Inhalt, oder None
+        """
+
+        with self._lock:
+            if version != self._version or key not in self._entries:
+                return None
+
+            self._entries.move_to_end(key)
+
+            return self._entries[key]
+
+    def put(
+            self,
+            version: str,
+            key: Hashable,
+            content_type: str,
+            content: bytes
+    ) -> None:
+        """
+            Speichert eine Antwort, sofern die Datenversion noch aktuell ist, und hält die Grenzen ein.
+
+        :param version: Datenversion, die vor der Anfrage galt
+        :param key: Schlüssel der Anfrage
+        :param content_type: Content-Type der Antwort
+        :param content: Inhalt der Antwort
+        """
+
+        if not self.max_entries or len(content) > self.max_bytes:
+            return
+
+        with self._lock:
+            if version != self._version:
+                return
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+
+            self._entries[key] = (content_type, content)
+            self._size += len(content)
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
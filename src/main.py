@@ -1,7 +1,16 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from .backend import endpoints
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    endpoints.startup()
+    yield
+    await endpoints.engines.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(endpoints.router)
 #  Esrom Johannes
\ No newline at end of file